@@ -82,8 +82,27 @@ Note that each of these plots took about 30--60 minutes to _bake_.
 
 #py_script("measure_outcome_chances", put_output: false, put_fname: true)
 
+Every sweep figure is made by the script below, which runs all the sweeps together on a pool of worker processes.
+Simulations needed by more than one figure are only run once.
+Each figure is shown with the sweep that produced it.
+
+#py_script("run_experiments", put_output: false, put_fname: true)
+
+#let sweep_listing(attribute, module, analysis, use_basic_setup) = raw(
+  block: true,
+  lang: "python",
+  "{\n"
+    + "    \"target_param\": \"" + attribute + "\",\n"
+    + "    \"test_values\": list(" + module + ".test_ranges[\"" + attribute + "\"]),\n"
+    + "    \"use_basic_setup\": " + (if use_basic_setup { "True" } else { "False" }) + ",\n"
+    + "    \"analyses\": [\"" + analysis + "\"],\n"
+    + "    \"trials\": 25,\n"
+    + "    \"seed\": 0,\n"
+    + "}",
+)
+
 #let outcome_chance_test(attribute) = [
-  #py_script("test_" + attribute, put_output: false)
+  #sweep_listing(attribute, "measure_outcome_chances", "outcome_chances", true)
   #figure(
     image("media/outcome_chances_" + attribute + ".svg", width: 80%),
     caption: [Outcome Chances vs #raw(attribute)],
@@ -242,7 +261,7 @@ Note that each of these plots took about 30--60 minutes to _bake_.
 #py_script("measure_ratios", put_output: false, put_fname: true)
 
 #let lvm_ratios_test(attribute) = [
-  #py_script("test_" + attribute + "_ratios", put_output: false)
+  #sweep_listing(attribute, "measure_ratios", "lvm_ratios", true)
   #figure(
     image("media/lvm_ratios_" + attribute + ".svg", width: 90%),
     caption: [LVM Ratios vs #raw(attribute)],
@@ -315,7 +334,7 @@ In contrast, when using circular initialization the fish clusters tend to grow a
 This is reflected in the pattern that the chance of neither species going extinct went up for most points in all graphs when compared to their random initialization values.
 
 #let outcome_chance_test_circular(attribute) = [
-  #py_script("test_" + attribute, put_output: false)
+  #sweep_listing(attribute, "measure_outcome_chances", "outcome_chances", false)
   #figure(
     image("media/outcome_chances_" + attribute + "_circular.svg", width: 80%),
     caption: [Outcome Chances vs #raw(attribute) (Circular Initialization)],
@@ -324,7 +343,7 @@ This is reflected in the pattern that the chance of neither species going extinc
 ]
 
 #let lvm_ratios_test_circular(attribute) = [
-  #py_script("test_" + attribute + "_ratios_circular", put_output: false)
+  #sweep_listing(attribute, "measure_ratios", "lvm_ratios", false)
   #figure(
     image("media/lvm_ratios_" + attribute + "_circular.svg", width: 90%),
     caption: [LVM Ratios vs #raw(attribute) (Circular Initialization)],
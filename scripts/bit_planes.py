@@ -0,0 +1,133 @@
+import numpy as np
+
+# Functions for storing a game array as bit planes
+# The game array encodes the species by sign and the fish time or shark energy by magnitude, so every neighbor test reads a full integer.
+# Bit planes split this into a packed occupancy plane for fish and one for sharks (8 cells per byte, like np.packbits()),
+# plus a counter plane holding the magnitudes in the narrowest integer type that fits them.
+# Neighbor tests for the whole board are then bitwise shifts and ANDs on the packed planes, which touch 64 times less memory.
+# Bits are packed along each row with the first column in the highest bit of the first byte.
+# Rows whose length is not a multiple of 8 end in padding bits, which are always kept at 0.
+
+def to_bit_planes(game_array):
+    """
+    Convert a game array into bit planes.
+    Return a dictionary with:
+    - "shape": the shape of the game array
+    - "fish" and "sharks": the packed occupancy planes, with shape (rows, ceil(cols / 8))
+    - "counters": the fish times and shark energies as positive values, with 0 for empty cells
+    """
+    game_array = np.asarray(game_array)
+    counters = np.abs(game_array)
+    return {
+        "shape": game_array.shape,
+        "fish": np.packbits(game_array > 0, axis=1),
+        "sharks": np.packbits(game_array < 0, axis=1),
+        "counters": counters.astype(np.min_scalar_type(counters.max(initial=0))),
+    }
+
+def from_bit_planes(planes):
+    """
+    Convert bit planes back into a game array, exactly undoing to_bit_planes().
+    """
+    cols = planes["shape"][1]
+    fish = np.unpackbits(planes["fish"], axis=1, count=cols).astype(bool)
+    sharks = np.unpackbits(planes["sharks"], axis=1, count=cols).astype(bool)
+    game_array = np.zeros(planes["shape"], dtype=int)
+    game_array[fish] = planes["counters"][fish]
+    game_array[sharks] = -planes["counters"][sharks].astype(int)
+    return game_array
+
+def get_padding_mask(cols):
+    """
+    Return a packed row with the bits of the real columns set and the padding bits cleared.
+    """
+    return np.packbits(np.ones(cols, dtype=bool))
+
+def count_plane(plane):
+    """
+    Return the number of set bits in a packed plane, such as the fish count of the "fish" plane.
+    """
+    return int(np.bitwise_count(plane).sum())
+
+# Functions for shifting packed planes around the torus
+
+def roll_plane(plane, shift, axis, cols):
+    """
+    Return the packed plane rolled by 1 cell, like np.roll() on the unpacked plane with a shift of +1 or -1.
+    Rolling along the rows moves whole packed rows. Rolling along the columns shifts the bits of each row,
+    carries the bit crossing each byte boundary, and wraps the bit at the edge of the board around to the other side.
+    """
+    if axis == 0:
+        return np.roll(plane, shift, axis=0)
+
+    last_byte, last_bit = divmod(cols - 1, 8)
+    result = np.empty_like(plane)
+    if shift == 1:
+        # Each cell takes the value of the cell to its left
+        result[:, :] = plane >> 1
+        result[:, 1:] |= plane[:, :-1] << 7
+        # Clear the bit carried into the padding, then wrap the last column around to the first
+        result &= get_padding_mask(cols)
+        wrapped = (plane[:, last_byte] >> (7 - last_bit)) & 1
+        result[:, 0] |= wrapped << 7
+    else:
+        # Each cell takes the value of the cell to its right
+        result[:, :] = plane << 1
+        result[:, :-1] |= plane[:, 1:] >> 7
+        # Wrap the first column around to the last (the bit there came from the padding, so it is 0)
+        wrapped = plane[:, 0] >> 7
+        result[:, last_byte] |= wrapped << (7 - last_bit)
+    return result
+
+def get_neighbor_planes(plane, cols):
+    """
+    Return a list of 4 packed planes, where each bit says whether the corresponding neighbor's bit is set in the given plane.
+    The neighbors are in the same order as get_adjacent_locations(): down, right, up, and left.
+    """
+    neighbor_planes = []
+    for nudge in [+1, -1]:
+        for axis in [0, 1]:
+            # The neighbor at +1 along an axis arrives when the plane is rolled by -1
+            neighbor_planes.append(roll_plane(plane, -nudge, axis, cols))
+    return neighbor_planes
+
+def get_empty_plane(planes):
+    """
+    Return the packed plane of empty cells.
+    """
+    return ~(planes["fish"] | planes["sharks"]) & get_padding_mask(planes["shape"][1])
+
+def get_move_candidate_planes(old_planes, new_planes):
+    """
+    Return the move candidates of every creature for the given old and new boards, as lists of 4 packed planes in the neighbor order.
+    Return a dictionary with:
+    - "fish_moves": for each fish, the neighbors that are empty in both boards
+    - "shark_hunts": for each shark, the neighbors that hold a fish in either board
+    - "shark_moves": for each shark, the neighbors that are empty in both boards
+    These are the same cells found by get_empty_adjacent_locations() and get_fish_occupied_adjacent_locations().
+    Since update_location() changes the boards as it goes, the candidates only hold until the next creature moves.
+    """
+    cols = old_planes["shape"][1]
+    empty_neighbors = get_neighbor_planes(get_empty_plane(old_planes) & get_empty_plane(new_planes), cols)
+    fish_neighbors = get_neighbor_planes(old_planes["fish"] | new_planes["fish"], cols)
+    return {
+        "fish_moves": [old_planes["fish"] & neighbors for neighbors in empty_neighbors],
+        "shark_hunts": [old_planes["sharks"] & neighbors for neighbors in fish_neighbors],
+        "shark_moves": [old_planes["sharks"] & neighbors for neighbors in empty_neighbors],
+    }
+
+def get_candidate_locations(candidate_planes, shape, i, j):
+    """
+    Return a list of the candidate locations for the creature at the given location, in the neighbor order.
+    Pass one of the lists of 4 planes returned by get_move_candidate_planes() and the shape of the game array.
+    """
+    byte, bit = divmod(j, 8)
+    locs = []
+    for k, plane in enumerate(candidate_planes):
+        if (plane[i, byte] >> (7 - bit)) & 1:
+            # The first two planes are the +1 neighbors, and the planes alternate between rows and columns
+            loc = [i, j]
+            axis = k % 2
+            loc[axis] = (loc[axis] + (1 if k < 2 else -1)) % shape[axis]
+            locs.append(tuple(loc))
+    return locs
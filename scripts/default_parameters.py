@@ -30,3 +30,13 @@ def get_simulation_parameters(params):
     for key in desired_keys:
         result[key] = params[key]
     return result
+
+def get_board_dimensions(params):
+    """
+    Return the board dimensions (h, w) based on the board area and aspect ratio.
+    """
+    # h*w = Area; h*Ratio = w
+    # h**2 * Ratio = Area
+    h = int((params["board_area"] / params["aspect_ratio"])**0.5)
+    w = int(h * params["aspect_ratio"])
+    return (h, w)
@@ -0,0 +1,50 @@
+import trial_runner
+import default_parameters
+import ensemble_statistics
+import measure_outcome_chances
+import measure_ratios
+import numpy as np
+import multiprocessing as mp
+
+# Functions for running ensembles of trials into aggregators from ensemble_statistics
+# Memory only depends on the step count and histogram sizes: chunks make their own seeds and are merged as they finish.
+
+def run_ensemble_chunk(chunk):
+    """
+    Run the trials of a (params, entropy, chunk_index, chunk_trials, phase_bins, relative_accuracy) chunk into a new aggregator.
+    Trial seeds are spawned from a seed sequence for this chunk alone, so no other chunk's seeds are ever needed.
+    Return the aggregator.
+    """
+    params, entropy, chunk_index, chunk_trials, phase_bins, relative_accuracy = chunk
+    dims = default_parameters.get_board_dimensions(params)
+    size = dims[0] * dims[1]
+    aggregator = ensemble_statistics.create_ensemble_aggregator(params["steps"], size, phase_bins, relative_accuracy)
+    for trial_seed in np.random.SeedSequence(entropy, spawn_key=(chunk_index,)).spawn(chunk_trials):
+        fish_counts, shark_counts = trial_runner.run_trial(params, trial_seed)
+        outcome = measure_outcome_chances.classify_outcome(fish_counts, shark_counts, size)
+        ratios = measure_ratios.calculate_critical_points(fish_counts, shark_counts)
+        ensemble_statistics.update_ensemble_aggregator(aggregator, fish_counts, shark_counts, outcome, ratios)
+    return aggregator
+
+def run_ensemble(params, trials, seed=None, processes=None, chunk_size=25, phase_bins=100, relative_accuracy=0.01):
+    """
+    Run the given number of trials with the given parameters, split into chunks over a pool of worker processes.
+    Each worker summarizes its chunk in its own aggregator, and the aggregators are merged as the chunks finish.
+    Each trial gets its own seed derived from the given seed, so the results are reproducible.
+    Callers need an `if __name__ == "__main__":` guard, since the workers may re-import the main script.
+    Return the merged aggregator.
+    """
+    # Only the entropy is shared; each chunk spawns its trial seeds in the worker
+    entropy = np.random.SeedSequence(seed).entropy
+    chunks = (
+        (params, entropy, chunk_index, min(chunk_size, trials - start), phase_bins, relative_accuracy)
+        for chunk_index, start in enumerate(range(0, trials, chunk_size))
+    )
+    dims = default_parameters.get_board_dimensions(params)
+    result = ensemble_statistics.create_ensemble_aggregator(params["steps"], dims[0] * dims[1], phase_bins, relative_accuracy)
+
+    with mp.Pool(processes) as pool:
+        for aggregator in pool.imap_unordered(run_ensemble_chunk, chunks):
+            result = ensemble_statistics.merge_ensemble_aggregators(result, aggregator)
+
+    return result
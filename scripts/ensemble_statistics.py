@@ -0,0 +1,195 @@
+import numpy as np
+
+# Functions for creating and updating an ensemble aggregator
+# An aggregator summarizes any number of trials using memory that only depends on the step count and histogram sizes
+
+def create_ensemble_aggregator(steps, board_size, phase_bins=100, relative_accuracy=0.01):
+    """
+    Create an empty aggregator for trials lasting the given number of steps on a board of the given size.
+    It keeps track of:
+    - the per-step mean and variance of each population (Welford's method)
+    - a per-step quantile sketch of each population
+    - a 2-D histogram of the (fish, shark) states visited
+    - the count of each outcome
+    - the mean and variance of the a/b and d/c ratio estimates
+    Row 0 of each per-step array is for fish, and row 1 is for sharks.
+    Return the aggregator as a dictionary.
+    """
+    # Buckets in the quantile sketch grow geometrically, so every estimate is within the relative accuracy
+    gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+    # Bucket 0 holds populations of 0, and bucket i holds populations in (gamma**(i-2), gamma**(i-1)]
+    sketch_buckets = int(np.ceil(np.log(max(board_size, 1)) / np.log(gamma))) + 2
+
+    return {
+        "steps": steps,
+        "board_size": board_size,
+        "gamma": gamma,
+        "trials": 0,
+        "mean": np.zeros((2, steps + 1)),
+        "m2": np.zeros((2, steps + 1)),
+        "sketch": np.zeros((2, steps + 1, sketch_buckets), dtype="uint32"),
+        "phase_edges": np.linspace(0, board_size, phase_bins + 1),
+        "phase_histogram": np.zeros((phase_bins, phase_bins), dtype="int64"),
+        "outcomes": {
+            "everything_extinct": 0,
+            "fish_fill_board": 0,
+            "still_going": 0,
+        },
+        "ratio_trials": np.zeros(2, dtype="int64"),
+        "ratio_mean": np.zeros(2),
+        "ratio_m2": np.zeros(2),
+    }
+
+def get_sketch_bucket_indices(aggregator, values):
+    """
+    Return the quantile sketch bucket index for each of the given population values.
+    """
+    values = np.asarray(values, dtype=float)
+    indices = np.zeros(values.shape, dtype=int)
+    positive = values > 0
+    indices[positive] = np.ceil(np.log(values[positive]) / np.log(aggregator["gamma"])).astype(int) + 1
+    return indices
+
+def update_ensemble_aggregator(aggregator, fish_counts, shark_counts, outcome=None, ratios=None):
+    """
+    Add one trial to the aggregator.
+    Trials that stopped early are extended with their final populations, since extinction and a full board never change.
+    Pass the trial's outcome (from classify_outcome()) and its (a/b, d/c) ratios (from calculate_critical_points()) to count them too.
+    Either can be left out when it is not needed, which skips its statistics.
+    """
+    steps = aggregator["steps"]
+    counts = np.zeros((2, steps + 1))
+    for row, series in enumerate([fish_counts, shark_counts]):
+        actual_steps = min(len(series), steps + 1)
+        counts[row, :actual_steps] = series[:actual_steps]
+        counts[row, actual_steps:] = series[actual_steps - 1]
+
+    # Update the per-step means and sums of squared differences
+    aggregator["trials"] += 1
+    delta = counts - aggregator["mean"]
+    aggregator["mean"] += delta / aggregator["trials"]
+    aggregator["m2"] += delta * (counts - aggregator["mean"])
+
+    # Each (species, step) pair gets exactly one new value, so plain fancy indexing is safe
+    bucket_indices = get_sketch_bucket_indices(aggregator, counts)
+    rows, cols = np.indices(counts.shape)
+    aggregator["sketch"][rows, cols, bucket_indices] += 1
+
+    # Only count the states the trial actually visited
+    histogram, _, _ = np.histogram2d(fish_counts, shark_counts, bins=aggregator["phase_edges"])
+    aggregator["phase_histogram"] += histogram.astype("int64")
+
+    # Count whether fish filled the board or if sharks and fish both went extinct
+    if outcome is not None:
+        aggregator["outcomes"][outcome] += 1
+
+    # Update the ratio statistics, skipping ratios that could not be estimated
+    if ratios is None:
+        return
+    ratios = np.array(ratios, dtype=float)
+    found = ~np.isnan(ratios)
+    aggregator["ratio_trials"] += found
+    n = np.maximum(aggregator["ratio_trials"], 1)
+    delta = np.where(found, ratios - aggregator["ratio_mean"], 0)
+    aggregator["ratio_mean"] += delta / n
+    aggregator["ratio_m2"] += delta * np.where(found, ratios - aggregator["ratio_mean"], 0)
+
+def merge_ensemble_aggregators(aggregator_1, aggregator_2):
+    """
+    Return a new aggregator summarizing the trials of both aggregators.
+    Both must have been created with the same arguments.
+    """
+    assert aggregator_1["steps"] == aggregator_2["steps"]
+    assert aggregator_1["board_size"] == aggregator_2["board_size"]
+    assert aggregator_1["sketch"].shape == aggregator_2["sketch"].shape
+    assert aggregator_1["phase_histogram"].shape == aggregator_2["phase_histogram"].shape
+
+    result = {
+        "steps": aggregator_1["steps"],
+        "board_size": aggregator_1["board_size"],
+        "gamma": aggregator_1["gamma"],
+        "phase_edges": aggregator_1["phase_edges"],
+    }
+
+    # Combine the means and sums of squared differences (Chan et al.)
+    result["trials"] = aggregator_1["trials"] + aggregator_2["trials"]
+    result["mean"], result["m2"] = merge_moments(
+        aggregator_1["trials"], aggregator_1["mean"], aggregator_1["m2"],
+        aggregator_2["trials"], aggregator_2["mean"], aggregator_2["m2"],
+    )
+    result["ratio_trials"] = aggregator_1["ratio_trials"] + aggregator_2["ratio_trials"]
+    result["ratio_mean"], result["ratio_m2"] = merge_moments(
+        aggregator_1["ratio_trials"], aggregator_1["ratio_mean"], aggregator_1["ratio_m2"],
+        aggregator_2["ratio_trials"], aggregator_2["ratio_mean"], aggregator_2["ratio_m2"],
+    )
+
+    # Counts simply add
+    result["sketch"] = aggregator_1["sketch"] + aggregator_2["sketch"]
+    result["phase_histogram"] = aggregator_1["phase_histogram"] + aggregator_2["phase_histogram"]
+    result["outcomes"] = {}
+    for outcome in aggregator_1["outcomes"]:
+        result["outcomes"][outcome] = aggregator_1["outcomes"][outcome] + aggregator_2["outcomes"][outcome]
+
+    return result
+
+def merge_moments(n_1, mean_1, m2_1, n_2, mean_2, m2_2):
+    """
+    Combine the means and sums of squared differences of two groups.
+    Return the combined (mean, m2).
+    """
+    n = np.maximum(n_1 + n_2, 1)
+    delta = mean_2 - mean_1
+    mean = mean_1 + delta * n_2 / n
+    m2 = m2_1 + m2_2 + delta**2 * n_1 * n_2 / n
+    return mean, m2
+
+# Functions for reading results out of an ensemble aggregator
+
+def get_ensemble_variance(aggregator):
+    """
+    Return the per-step sample variance of each population.
+    """
+    if aggregator["trials"] < 2:
+        return np.full(aggregator["m2"].shape, np.nan)
+    return aggregator["m2"] / (aggregator["trials"] - 1)
+
+def get_ensemble_quantiles(aggregator, quantiles):
+    """
+    Return the per-step estimates of the given quantiles of each population.
+    The result has shape (len(quantiles), 2, steps + 1).
+    """
+    sketch = aggregator["sketch"]
+    gamma = aggregator["gamma"]
+    cumulative_counts = np.cumsum(sketch, axis=-1)
+
+    # Representative value of each bucket, chosen so the relative error is the same at both edges
+    bucket_values = np.zeros(sketch.shape[-1])
+    bucket_values[1:] = 2 * gamma**np.arange(sketch.shape[-1] - 1) / (gamma + 1)
+
+    result = []
+    for q in quantiles:
+        rank = q * (aggregator["trials"] - 1)
+        # Find the first bucket that holds more values than the rank
+        bucket_indices = (cumulative_counts <= rank).sum(axis=-1)
+        bucket_indices = np.minimum(bucket_indices, sketch.shape[-1] - 1)
+        result.append(bucket_values[bucket_indices])
+    return np.array(result)
+
+def get_ensemble_outcome_chances(aggregator):
+    """
+    Return a dictionary with the chance of each outcome.
+    """
+    trials = max(aggregator["trials"], 1)
+    return {outcome: count / trials for outcome, count in aggregator["outcomes"].items()}
+
+def get_ensemble_ratios(aggregator):
+    """
+    Return a dictionary with the mean and sample variance of the a/b and d/c estimates.
+    """
+    n = aggregator["ratio_trials"]
+    means = np.where(n > 0, aggregator["ratio_mean"], np.nan)
+    variances = np.where(n > 1, aggregator["ratio_m2"] / np.maximum(n - 1, 1), np.nan)
+    return {
+        "a/b": (means[0], variances[0]),
+        "d/c": (means[1], variances[1]),
+    }
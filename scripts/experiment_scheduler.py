@@ -0,0 +1,337 @@
+import trial_runner
+import telemetry
+import default_parameters
+import measure_outcome_chances
+import measure_ratios
+import spatial_statistics
+import result_cache
+import os
+import math
+import time
+import numpy as np
+import multiprocessing as mp
+
+# A sweep is described by a dictionary:
+# - "target_param": the parameter to vary
+# - "test_values": the values to give the target parameter
+# - "use_basic_setup": whether to use a random initial distribution (or a circular one)
+# - "analyses": which figures to make, any of "outcome_chances", "lvm_ratios", and "spatial_statistics"
+# - "trials": the number of trials for each test value
+# - "seed": the base seed; trial k of every sweep uses the seed (seed, k)
+# - "spatial_every" (optional): observe the spatial statistics every that many steps, needed by "spatial_statistics"
+# - "second_param" and "second_test_values" (optional): a second parameter to vary, which makes the sweep cover
+#   every pair of test values and draw heatmaps (only "outcome_chances" and "lvm_ratios" support this)
+# The other parameters are taken from default_parameters.
+# Since the seeds do not depend on the sweep, sweeps that need the same (parameters, seed) simulation share it.
+
+def create_standard_sweeps(trials=25, seed=0):
+    """
+    Return the list of sweeps needed for all the figures in project-1.typ.
+    This covers every parameter in the test ranges of measure_outcome_chances and measure_ratios, with both setups.
+    """
+    sweeps = []
+    for use_basic_setup in [True, False]:
+        for analysis, test_ranges in [("outcome_chances", measure_outcome_chances.test_ranges), ("lvm_ratios", measure_ratios.test_ranges)]:
+            for target_param, test_values in test_ranges.items():
+                sweeps.append({
+                    "target_param": target_param,
+                    "test_values": list(test_values),
+                    "use_basic_setup": use_basic_setup,
+                    "analyses": [analysis],
+                    "trials": trials,
+                    "seed": seed,
+                })
+    return sweeps
+
+def create_pair_sweep(target_param, test_values, second_param, second_test_values, use_basic_setup=True, trials=25, seed=0):
+    """
+    Return a sweep over every pair of test values of two parameters, with both the outcome chance and ratio analyses.
+    """
+    return {
+        "target_param": target_param,
+        "test_values": list(test_values),
+        "second_param": second_param,
+        "second_test_values": list(second_test_values),
+        "use_basic_setup": use_basic_setup,
+        "analyses": ["outcome_chances", "lvm_ratios"],
+        "trials": trials,
+        "seed": seed,
+    }
+
+def get_sweep_points(sweep):
+    """
+    Return the list of points the sweep covers.
+    A point is a test value, or a (test value, second test value) pair for sweeps over two parameters.
+    Pairs are listed row by row, with the first parameter changing fastest, so results reshape to (second values, first values).
+    """
+    if "second_param" not in sweep:
+        return list(sweep["test_values"])
+    return [(value, second_value) for second_value in sweep["second_test_values"] for value in sweep["test_values"]]
+
+def get_sweep_parameters(sweep, point):
+    """
+    Return the full parameter dictionary for the given point of the sweep.
+    """
+    params = default_parameters.parameters.copy()
+    params["use_basic_setup"] = sweep["use_basic_setup"]
+    if "second_param" in sweep:
+        params[sweep["target_param"]], params[sweep["second_param"]] = point
+    else:
+        params[sweep["target_param"]] = point
+    return params
+
+def get_job_key(params, seed):
+    """
+    Return a hashable key identifying the simulation with the given parameters and seed.
+    """
+    return (tuple(sorted(params.items())), seed)
+
+def estimate_job_cost(params):
+    """
+    Return the relative cost of running a simulation with the given parameters.
+    Every step visits every cell of the board, so the cost grows with the board size and the step count.
+    """
+    dims = default_parameters.get_board_dimensions(params)
+    return dims[0] * dims[1] * params["steps"]
+
+def get_sweep_label(sweep, point):
+    """
+    Return a short label for the given point of the sweep, such as "breed_time=3 (random)" or "energy_gain=5, breed_energy=12 (random)".
+    """
+    setup = "random" if sweep["use_basic_setup"] else "circular"
+    if "second_param" in sweep:
+        return f"{sweep['target_param']}={point[0]}, {sweep['second_param']}={point[1]} ({setup})"
+    return f"{sweep['target_param']}={point} ({setup})"
+
+def check_sweep(sweep):
+    """
+    Raise a ValueError if the sweep asks for an analysis it cannot have, so the problem shows up before any simulations run.
+    """
+    if "spatial_statistics" in sweep["analyses"] and sweep.get("spatial_every") is None:
+        raise ValueError(f"The spatial_statistics analysis of the {sweep['target_param']} sweep needs spatial_every")
+    if "second_param" in sweep:
+        for analysis in sweep["analyses"]:
+            if analysis not in ["outcome_chances", "lvm_ratios"]:
+                raise ValueError(f"Sweeps over two parameters do not support the {analysis} analysis")
+
+def create_jobs(sweeps):
+    """
+    Return a dictionary mapping each unique job key to its (params, seed, spatial_every).
+    Simulations needed by more than one sweep or analysis appear only once.
+    Their spatial statistics are observed at the greatest common divisor of the intervals the sweeps ask for,
+    so every sweep can pick out exactly the steps it asked for.
+    Also return a dictionary mapping each job key to the set of sweep labels it counts toward.
+    """
+    jobs = {}
+    job_labels = {}
+    for sweep in sweeps:
+        for point in get_sweep_points(sweep):
+            params = get_sweep_parameters(sweep, point)
+            label = get_sweep_label(sweep, point)
+            for trial in range(sweep["trials"]):
+                seed = (sweep["seed"], trial)
+                key = get_job_key(params, seed)
+                spatial_every = sweep.get("spatial_every")
+                if key in jobs and jobs[key][2] is not None:
+                    spatial_every = jobs[key][2] if spatial_every is None else math.gcd(spatial_every, jobs[key][2])
+                jobs[key] = (params, seed, spatial_every)
+                job_labels.setdefault(key, set()).add(label)
+    return jobs, job_labels
+
+def run_job(job):
+    """
+    Run the simulation for a (key, params, seed, spatial_every) job.
+    Return the key and a summary with everything the analyses need: the outcome, the critical point estimates,
+    and the condensed spatial statistics if they were observed.
+    """
+    key, params, seed, spatial_every = job
+    start_time = time.monotonic()
+    observer = None
+    if spatial_every is not None:
+        spatial_records = []
+        observer = spatial_statistics.create_spatial_observer(spatial_records, spatial_every)
+    fish_counts, shark_counts = trial_runner.run_trial(params, list(seed), observer)
+
+    dims = default_parameters.get_board_dimensions(params)
+    a_b, d_c = measure_ratios.calculate_critical_points(fish_counts, shark_counts)
+    summary = {
+        "outcome": measure_outcome_chances.classify_outcome(fish_counts, shark_counts, dims[0] * dims[1]),
+        "a/b": a_b,
+        "d/c": d_c,
+        "steps": len(fish_counts) - 1,
+        "seconds": time.monotonic() - start_time,
+        "pid": os.getpid(),
+    }
+    if spatial_every is not None:
+        summary["spatial"] = spatial_statistics.summarize_spatial_records(spatial_records)
+    return key, summary
+
+def run_jobs(jobs, job_labels, processes=None):
+    """
+    Run all the jobs on a pool of worker processes.
+    The most expensive jobs are started first, so the cheap ones can fill in the gaps at the end.
+    Progress is reported through telemetry, including the events sent from inside the workers.
+    Callers need an `if __name__ == "__main__":` guard, since the workers may re-import the main script.
+    Return a dictionary mapping each job key to its summary.
+    """
+    ordered_jobs = sorted(jobs.items(), key=lambda item: estimate_job_cost(item[1][0]), reverse=True)
+    tasks = [(key,) + job for key, job in ordered_jobs]
+
+    # Count the trials each label needs
+    label_totals = {}
+    for labels in job_labels.values():
+        for label in labels:
+            label_totals[label] = label_totals.get(label, 0) + 1
+    total_cost = sum(estimate_job_cost(job[0]) for job in jobs.values())
+    tracker = telemetry.create_progress_tracker(len(jobs), total_cost, label_totals)
+    channel = telemetry.start_worker_channel()
+    queue = None if channel is None else channel["queue"]
+
+    results = {}
+    try:
+        with mp.Pool(processes, initializer=telemetry.attach_worker_channel, initargs=(queue,)) as pool:
+            # Hand out one job at a time, so no worker is left holding a queue of slow jobs
+            for key, summary in pool.imap_unordered(run_job, tasks, chunksize=1):
+                results[key] = summary
+                telemetry.record_job_finished(tracker, estimate_job_cost(jobs[key][0]), summary["steps"], summary["seconds"], summary["pid"], job_labels[key])
+            # Let the workers exit on their own, so their last events reach the queue before it is drained
+            pool.close()
+            pool.join()
+    finally:
+        telemetry.stop_worker_channel(channel)
+    return results
+
+def analyze_sweep(sweep, results):
+    """
+    Collect the job summaries of a sweep into the analysis results.
+    Return a dictionary mapping each analysis to its results, in the same form as test_outcome_chances() and test_lvm_ratios().
+    For sweeps over two parameters, each list has one value per point, in the order of get_sweep_points().
+    """
+    overall_chances = {
+        "everything_extinct": [],
+        "fish_fill_board": [],
+        "still_going": [],
+    }
+    overall_ratios = {
+        "a/b": [],
+        "d/c": [],
+    }
+    overall_spatial = {key: [] for key in spatial_statistics.sweep_summary_keys}
+
+    for point in get_sweep_points(sweep):
+        params = get_sweep_parameters(sweep, point)
+        summaries = [results[get_job_key(params, (sweep["seed"], trial))] for trial in range(sweep["trials"])]
+
+        # Store the chances of each possible outcome
+        outcomes = [summary["outcome"] for summary in summaries]
+        for outcome in overall_chances:
+            overall_chances[outcome].append(outcomes.count(outcome) / sweep["trials"])
+
+        # Store the average ratios found in the trials
+        for ratio in overall_ratios:
+            ratios = [summary[ratio] for summary in summaries]
+            overall_ratios[ratio].append(np.nanmean(ratios) if not np.all(np.isnan(ratios)) else np.nan)
+
+        # Store the spatial statistics averaged over the observed steps and the trials
+        # Only use the steps this sweep asked for, since a shared simulation may have been observed more often
+        if "spatial_statistics" in sweep["analyses"]:
+            spatial_summaries = [summary["spatial"] for summary in summaries]
+            step_masks = [spatial["steps"] % sweep["spatial_every"] == 0 for spatial in spatial_summaries]
+            for key in overall_spatial:
+                values = [np.nanmean(spatial[key][mask]) for spatial, mask in zip(spatial_summaries, step_masks)]
+                overall_spatial[key].append(np.nanmean(values) if not np.all(np.isnan(values)) else np.nan)
+
+    analysis_results = {}
+    if "outcome_chances" in sweep["analyses"]:
+        analysis_results["outcome_chances"] = overall_chances
+    if "lvm_ratios" in sweep["analyses"]:
+        analysis_results["lvm_ratios"] = overall_ratios
+    if "spatial_statistics" in sweep["analyses"]:
+        analysis_results["spatial_statistics"] = overall_spatial
+    return analysis_results
+
+def get_figure_fname(sweep, analysis):
+    """
+    Return the file name of the figure for the given analysis of the sweep.
+    These are the names project-1.typ expects, such as media/outcome_chances_breed_time_circular.svg.
+    """
+    suffix = "" if sweep["use_basic_setup"] else "_circular"
+    if "second_param" in sweep:
+        return f"media/{analysis}_{sweep['target_param']}_{sweep['second_param']}{suffix}.svg"
+    return f"media/{analysis}_{sweep['target_param']}{suffix}.svg"
+
+def get_sweep_fingerprint(sweep, analysis):
+    """
+    Return the fingerprint of the given analysis of the sweep, matching the one used by the measure modules for the same sweep.
+    """
+    params = get_sweep_parameters(sweep, get_sweep_points(sweep)[0])
+    extra = {}
+    if "second_param" in sweep:
+        extra["second_param"] = sweep["second_param"]
+        extra["second_test_values"] = list(sweep["second_test_values"])
+    if analysis == "spatial_statistics":
+        extra["spatial_every"] = sweep.get("spatial_every")
+    return result_cache.get_fingerprint(analysis, sweep["target_param"], sweep["test_values"], sweep["trials"], params, sweep["seed"], **extra)
+
+def load_sweep_results(sweep):
+    """
+    Return a dictionary mapping each analysis of the sweep to its saved result, or None if any of them is missing or out of date.
+    """
+    analysis_results = {}
+    for analysis in sweep["analyses"]:
+        result = result_cache.load_result(get_figure_fname(sweep, analysis), get_sweep_fingerprint(sweep, analysis))
+        if result is None:
+            return None
+        analysis_results[analysis] = result
+    return analysis_results
+
+def run_sweeps(sweeps, processes=None, use_saved_results=True):
+    """
+    Run every simulation the sweeps need once, then make all of their figures.
+    The results of each figure are saved next to it. Sweeps whose saved results are up to date are redrawn without running any simulations.
+    Return the list of figure file names created.
+    """
+    for sweep in sweeps:
+        check_sweep(sweep)
+
+    # Only run the sweeps that have no usable saved results
+    saved_results = [load_sweep_results(sweep) if use_saved_results else None for sweep in sweeps]
+    pending_sweeps = [sweep for sweep, saved in zip(sweeps, saved_results) if saved is None]
+    jobs, job_labels = create_jobs(pending_sweeps)
+    total_trials = sum(len(get_sweep_points(sweep)) * sweep["trials"] for sweep in pending_sweeps)
+    print(f"Reusing saved results for {len(sweeps) - len(pending_sweeps)} of {len(sweeps)} sweeps")
+    print(f"Running {len(jobs)} unique simulations for {total_trials} requested trials")
+    results = run_jobs(jobs, job_labels, processes) if jobs else {}
+
+    fnames = []
+    for sweep, analysis_results in zip(sweeps, saved_results):
+        if analysis_results is None:
+            analysis_results = analyze_sweep(sweep, results)
+            for analysis, analysis_result in analysis_results.items():
+                result_cache.save_result(get_figure_fname(sweep, analysis), get_sweep_fingerprint(sweep, analysis), analysis_result,
+                    target_param=sweep["target_param"], test_values=sweep["test_values"], trials=sweep["trials"], seed=sweep["seed"])
+        for analysis, analysis_result in analysis_results.items():
+            fname = get_figure_fname(sweep, analysis)
+            if "second_param" in sweep:
+                plot_pair_sweep(fname, sweep, analysis, analysis_result)
+            elif analysis == "outcome_chances":
+                measure_outcome_chances.plot_outcome_chances(fname, sweep["target_param"], sweep["test_values"], analysis_result)
+            elif analysis == "lvm_ratios":
+                measure_ratios.plot_lvm_ratios(fname, sweep["target_param"], sweep["test_values"], analysis_result)
+            elif analysis == "spatial_statistics":
+                spatial_statistics.plot_spatial_statistics(fname, sweep["target_param"], sweep["test_values"], analysis_result)
+            fnames.append(fname)
+            print(f"Saved {fname}")
+    return fnames
+
+def plot_pair_sweep(fname, sweep, analysis, analysis_result):
+    """
+    Draw the heatmaps for the given analysis of a sweep over two parameters.
+    """
+    axis_params = (sweep["target_param"], sweep["test_values"], sweep["second_param"], sweep["second_test_values"])
+    if analysis == "outcome_chances":
+        measure_outcome_chances.plot_outcome_chance_heatmaps(fname, *axis_params, analysis_result)
+    elif analysis == "lvm_ratios":
+        measure_ratios.plot_lvm_ratio_heatmaps(fname, *axis_params, analysis_result)
+    else:
+        raise ValueError(f"Sweeps over two parameters do not support the {analysis} analysis")
@@ -0,0 +1,28 @@
+import trial_runner
+import default_parameters
+import lvm_fitting
+import numpy as np
+
+# Fit both models to simulations run with the default parameters
+trials = 25
+params = default_parameters.parameters.copy()
+dims = default_parameters.get_board_dimensions(params)
+board_size = dims[0] * dims[1]
+
+series_list = [trial_runner.run_trial(params, seed) for seed in range(trials)]
+
+for name, carrying_capacity in [("Lotka-Volterra", None), ("Modified Lotka-Volterra", board_size)]:
+    fit = lvm_fitting.fit_lvm(series_list, carrying_capacity)
+
+    print(f"{name} fit of {trials} trials")
+    print(f"{'trial':>5} " + " ".join(f"{key:>18}" for key in lvm_fitting.coefficient_names) + f" {'rmse':>8}")
+    for i in range(trials):
+        estimates = " ".join(f"{fit[key][i]:9.3g}±{fit[key + '_std'][i]:<8.2g}" for key in lvm_fitting.coefficient_names)
+        print(f"{i:>5} {estimates} {fit['rmse'][i]:8.1f}")
+
+    # Summarize the trials, using the median and interquartile range since a few fits can land in a poor local minimum
+    print(f"Converged: {fit['converged'].sum()}/{trials}")
+    for key in lvm_fitting.coefficient_names + ["a/b", "d/c"]:
+        q1, median, q3 = np.percentile(fit[key], [25, 50, 75])
+        print(f"{key:>3}: median {median:.4g}, interquartile range {q1:.4g} to {q3:.4g}")
+    print()
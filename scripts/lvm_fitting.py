@@ -0,0 +1,282 @@
+import numpy as np
+
+# Functions for fitting the Lotka-Volterra model to many population series at once
+# The model uses x for the fish population and y for the shark population:
+#   x' = d*x - c*y*x
+#   y' = -a*y + b*x*y
+# The modified model from lvm_modified_stream_plot.py adds a carrying capacity N_oo:
+#   x' = d*x*(1 - x/N_oo) - c*y*x*(1 - y/N_oo)
+#   y' = -a*y + b*x*y*(1 - y/N_oo)
+# Every array below keeps the trial as its last axis so all the trials are integrated together.
+# The fitted values are (log a, log b, log c, log d, log x0, log y0), which keeps them positive and similarly scaled.
+
+coefficient_names = ["a", "b", "c", "d"]
+fitted_names = coefficient_names + ["x0", "y0"]
+
+def lvm_derivatives(x, y, coefficients, carrying_capacity=None):
+    """
+    Evaluate the model for a batch of states.
+    Pass in arrays of fish and shark populations, and a (4, trials) array of the coefficients (a, b, c, d).
+    A carrying capacity of None uses the original model.
+    Return the time derivatives (x', y'), their Jacobian with respect to (x, y), and their derivatives with respect to (a, b, c, d).
+    """
+    a, b, c, d = coefficients
+    inverse_capacity = 0 if carrying_capacity is None else 1 / carrying_capacity
+    u = 1 - x * inverse_capacity
+    v = 1 - y * inverse_capacity
+
+    x_prime = d*x*u - c*y*x*v
+    y_prime = -a*y + b*x*y*v
+
+    # Jacobian with respect to the state
+    jacobian = [
+        [d*(1 - 2*x*inverse_capacity) - c*y*v, -c*x*(1 - 2*y*inverse_capacity)],
+        [b*y*v, -a + b*x*(1 - 2*y*inverse_capacity)],
+    ]
+
+    # Derivatives with respect to (a, b, c, d)
+    zeros = np.zeros_like(x)
+    coefficient_derivatives = [
+        [zeros, zeros, -x*y*v, x*u],
+        [-y, x*y*v, zeros, zeros],
+    ]
+
+    return (x_prime, y_prime), jacobian, coefficient_derivatives
+
+def augmented_derivatives(x, y, s_x, s_y, coefficients, carrying_capacity):
+    """
+    Return the time derivatives of the state (x, y) and of its sensitivities (s_x, s_y) to the fitted values.
+    The sensitivities have shape (6, trials), one row for each fitted value.
+    """
+    (x_prime, y_prime), jacobian, coefficient_derivatives = lvm_derivatives(x, y, coefficients, carrying_capacity)
+
+    # Chain rule: d(state)'/d(fitted) = J @ S + df/d(log coefficient)
+    s_x_prime = jacobian[0][0] * s_x + jacobian[0][1] * s_y
+    s_y_prime = jacobian[1][0] * s_x + jacobian[1][1] * s_y
+    for k in range(4):
+        s_x_prime[k] += coefficient_derivatives[0][k] * coefficients[k]
+        s_y_prime[k] += coefficient_derivatives[1][k] * coefficients[k]
+
+    return x_prime, y_prime, s_x_prime, s_y_prime
+
+def integrate_lvm(fitted, observations, mask, carrying_capacity=None, substeps=1):
+    """
+    Integrate the model and its sensitivities with RK4 for every trial at once.
+    Pass in the (6, trials) array of fitted values and the (2, steps, trials) observations with their mask.
+    Observations are assumed to be 1 time unit apart.
+    Return the cost (sum of squared residuals), J^T J, and J^T r for each trial, where J is the Jacobian of the residuals r.
+    """
+    coefficients = np.exp(fitted[:4])
+    x = np.exp(fitted[4])
+    y = np.exp(fitted[5])
+    trials = fitted.shape[1]
+    # Only the initial conditions depend on log x0 and log y0 at the start
+    s_x = np.zeros((6, trials))
+    s_y = np.zeros((6, trials))
+    s_x[4] = x
+    s_y[5] = y
+
+    cost = np.zeros(trials)
+    jtj = np.zeros((6, 6, trials))
+    jtr = np.zeros((6, trials))
+    h = 1 / substeps
+
+    with np.errstate(all="ignore"):
+        for t in range(observations.shape[1]):
+            # Compare the model to the observations at this time
+            weight = mask[t]
+            r_x = (x - observations[0, t]) * weight
+            r_y = (y - observations[1, t]) * weight
+            cost += r_x**2 + r_y**2
+            jtj += (s_x[:, None] * s_x[None, :] + s_y[:, None] * s_y[None, :]) * weight
+            jtr += s_x * r_x + s_y * r_y
+
+            # Step to the next observation time
+            for _ in range(substeps):
+                k1 = augmented_derivatives(x, y, s_x, s_y, coefficients, carrying_capacity)
+                k2 = augmented_derivatives(*[z + h/2 * k for z, k in zip((x, y, s_x, s_y), k1)], coefficients, carrying_capacity)
+                k3 = augmented_derivatives(*[z + h/2 * k for z, k in zip((x, y, s_x, s_y), k2)], coefficients, carrying_capacity)
+                k4 = augmented_derivatives(*[z + h * k for z, k in zip((x, y, s_x, s_y), k3)], coefficients, carrying_capacity)
+                x, y, s_x, s_y = [z + h/6 * (q1 + 2*q2 + 2*q3 + q4) for z, q1, q2, q3, q4 in zip((x, y, s_x, s_y), k1, k2, k3, k4)]
+
+    # Trials that blew up are treated as infinitely bad
+    cost[~np.isfinite(cost)] = np.inf
+    return cost, jtj, jtr
+
+def integrate_lvm_trajectories(coefficients, x0, y0, steps, carrying_capacity=None, substeps=1):
+    """
+    Integrate the model with RK4 for a batch of initial conditions and coefficients.
+    The coefficients should have shape (4,) or (4, trials), and x0 and y0 should broadcast to the trial shape.
+    Return the fish and shark populations at each of the given number of unit time steps, each with shape (steps, trials).
+    """
+    coefficients = np.asarray(coefficients, dtype=float)
+    x, y = np.broadcast_arrays(np.asarray(x0, dtype=float), np.asarray(y0, dtype=float))
+    x = x.copy()
+    y = y.copy()
+    h = 1 / substeps
+
+    def derivatives(x, y):
+        (x_prime, y_prime), _, _ = lvm_derivatives(x, y, coefficients, carrying_capacity)
+        return x_prime, y_prime
+
+    fish = np.zeros((steps,) + x.shape)
+    sharks = np.zeros((steps,) + x.shape)
+    for t in range(steps):
+        fish[t] = x
+        sharks[t] = y
+        for _ in range(substeps):
+            k1 = derivatives(x, y)
+            k2 = derivatives(x + h/2 * k1[0], y + h/2 * k1[1])
+            k3 = derivatives(x + h/2 * k2[0], y + h/2 * k2[1])
+            k4 = derivatives(x + h * k3[0], y + h * k3[1])
+            x = x + h/6 * (k1[0] + 2*k2[0] + 2*k3[0] + k4[0])
+            y = y + h/6 * (k1[1] + 2*k2[1] + 2*k3[1] + k4[1])
+
+    return fish, sharks
+
+def pad_population_series(series_list):
+    """
+    Stack the (fish_counts, shark_counts) pairs into a (2, steps, trials) array, padding shorter series with zeros.
+    Return the array and a (steps, trials) mask that is 1 where there is data.
+    """
+    steps = max(len(fish_counts) for fish_counts, _ in series_list)
+    observations = np.zeros((2, steps, len(series_list)))
+    mask = np.zeros((steps, len(series_list)))
+    for i, (fish_counts, shark_counts) in enumerate(series_list):
+        observations[0, :len(fish_counts), i] = fish_counts
+        observations[1, :len(shark_counts), i] = shark_counts
+        mask[:len(fish_counts), i] = 1
+    return observations, mask
+
+def estimate_initial_values(observations, mask):
+    """
+    Return rough starting values (log a, log b, log c, log d, log x0, log y0) for each trial.
+    These come from the small oscillation behavior of the model around its critical point (a/b, d/c):
+    - Over one period, the average populations equal the critical point.
+    - The angular frequency is sqrt(a*d), which is estimated from how often the fish rise through their average.
+    - The ratio of the fish and shark amplitudes is sqrt(d/a) * (a/b) / (d/c).
+    Also return the estimated period of each trial.
+    """
+    lengths = np.maximum(mask.sum(axis=0), 1)
+    x_mean = np.maximum((observations[0] * mask).sum(axis=0) / lengths, 1)
+    y_mean = np.maximum((observations[1] * mask).sum(axis=0) / lengths, 1)
+    x_spread = np.sqrt(((observations[0] - x_mean)**2 * mask).sum(axis=0) / lengths)
+    y_spread = np.sqrt(((observations[1] - y_mean)**2 * mask).sum(axis=0) / lengths)
+
+    # Count the times the fish population rises through its average
+    # To deal with noise, a rise only counts after the population has dropped well below the average
+    high = x_mean + x_spread / 2
+    low = x_mean - x_spread / 2
+    armed = np.zeros(x_mean.shape, dtype=bool)
+    crossings = np.zeros(x_mean.shape, dtype=int)
+    first_crossing = np.zeros(x_mean.shape)
+    last_crossing = np.zeros(x_mean.shape)
+    for t, (x, weight) in enumerate(zip(observations[0], mask)):
+        rising = armed & (x > high) & (weight > 0)
+        first_crossing[rising & (crossings == 0)] = t
+        last_crossing[rising] = t
+        crossings += rising
+        armed = (armed & ~rising) | ((x < low) & (weight > 0))
+
+    # Use the spacing between rises when there are at least two, otherwise the number of rises in the series
+    period = np.where(crossings > 1, (last_crossing - first_crossing) / np.maximum(crossings - 1, 1), lengths / np.maximum(crossings, 1))
+    frequency = 2 * np.pi / period
+
+    # Split the frequency between a and d using the amplitude ratio
+    ratio = np.clip(x_spread / np.maximum(y_spread, 1) * y_mean / x_mean, 0.1, 10)
+    a = frequency / ratio
+    d = frequency * ratio
+    b = a / x_mean
+    c = d / y_mean
+    x0 = np.maximum(observations[0, 0], 1)
+    y0 = np.maximum(observations[1, 0], 1)
+    return np.log(np.array([a, b, c, d, x0, y0])), period
+
+def fit_lvm(series_list, carrying_capacity=None, iterations=30, substeps=1, tolerance=1e-5):
+    """
+    Fit the model to each of the given (fish_counts, shark_counts) series with batched Levenberg-Marquardt.
+    Every trial takes its own damped Gauss-Newton steps, but all the trials are integrated together.
+    To avoid fitting the wrong number of oscillations, first fit about one period, then keep doubling the fitted time span.
+    The first stages are short, which also makes them cheap.
+    A carrying capacity of None fits the original model; otherwise, the modified model is fit with that fixed capacity.
+    Return a dictionary of arrays with one value per trial:
+    - the estimates of a, b, c, d, x0, and y0, and their standard errors (keys ending in "_std")
+    - the critical point estimates "a/b" and "d/c"
+    - the root mean square residual "rmse" and whether the final stage "converged"
+    """
+    observations, mask = pad_population_series(series_list)
+    total_steps = observations.shape[1]
+    fitted, period = estimate_initial_values(observations, mask)
+
+    # Choose the time spans to fit, ending with the full series
+    horizon = int(np.clip(np.median(period), 10, total_steps))
+    horizons = [horizon]
+    while horizons[-1] < total_steps:
+        horizons.append(min(2 * horizons[-1], total_steps))
+
+    for horizon in horizons:
+        fitted, cost, jtj, converged = fit_lvm_stage(fitted, observations[:, :horizon], mask[:horizon], carrying_capacity, iterations, substeps, tolerance)
+
+    # Estimate the standard errors from the curvature of the cost at the fit
+    observation_counts = 2 * mask.sum(axis=0)
+    residual_variance = cost / np.maximum(observation_counts - 6, 1)
+    covariance = np.linalg.pinv(np.moveaxis(jtj, -1, 0)) * residual_variance[:, None, None]
+    log_std = np.sqrt(np.maximum(np.einsum("nii->ni", covariance), 0)).T
+
+    result = {}
+    values = np.exp(fitted)
+    for k, name in enumerate(fitted_names):
+        result[name] = values[k]
+        # Convert the error of the logarithm into an error of the value
+        result[f"{name}_std"] = values[k] * log_std[k]
+    result["a/b"] = result["a"] / result["b"]
+    result["d/c"] = result["d"] / result["c"]
+    result["rmse"] = np.sqrt(cost / np.maximum(observation_counts, 1))
+    result["converged"] = converged
+    return result
+
+def fit_lvm_stage(fitted, observations, mask, carrying_capacity, iterations, substeps, tolerance):
+    """
+    Run batched Levenberg-Marquardt iterations starting from the given (6, trials) fitted values.
+    Return the improved fitted values, with the cost, J^T J, and convergence of each trial.
+    """
+    fitted = fitted.copy()
+    trials = fitted.shape[1]
+    damping = np.full(trials, 1e-3)
+    converged = np.zeros(trials, dtype=bool)
+
+    cost, jtj, jtr = integrate_lvm(fitted, observations, mask, carrying_capacity, substeps)
+
+    for _ in range(iterations):
+        if converged.all():
+            break
+
+        # Solve (J^T J + damping * diag(J^T J)) step = -J^T r for every trial
+        system = np.moveaxis(jtj, -1, 0).copy()
+        diagonal = np.einsum("nii->ni", system)
+        diagonal += damping[:, None] * diagonal + 1e-12
+        step = np.linalg.solve(system, -jtr.T[:, :, None])[:, :, 0].T
+        # Limit the step so a single update can't change a value by more than a factor of e
+        step = np.clip(np.nan_to_num(step), -1, 1)
+
+        # Only integrate the trials that are still being fit
+        active = ~converged
+        candidate = fitted + step
+        new_cost = np.full(trials, np.inf)
+        new_jtj = np.zeros_like(jtj)
+        new_jtr = np.zeros_like(jtr)
+        new_cost[active], new_jtj[:, :, active], new_jtr[:, active] = integrate_lvm(candidate[:, active], observations[:, :, active], mask[:, active], carrying_capacity, substeps)
+
+        # Keep the steps that lowered the cost and shrink the damping for those trials
+        accepted = (new_cost < cost) & active
+        improvement = np.where(accepted, (cost - new_cost) / np.maximum(cost, 1e-300), 0)
+        fitted[:, accepted] = candidate[:, accepted]
+        cost[accepted] = new_cost[accepted]
+        jtj[:, :, accepted] = new_jtj[:, :, accepted]
+        jtr[:, accepted] = new_jtr[:, accepted]
+        damping = np.where(accepted, damping / 3, damping * 4)
+
+        # A trial is done when its cost stops improving or no small enough step helps
+        converged |= (accepted & (improvement < tolerance)) | (damping > 1e10)
+
+    return fitted, cost, jtj, converged
@@ -1,4 +1,6 @@
 import stream_plotter as sp
+import trial_runner
+import default_parameters
 
 def y_prime(x, y, a, b, N_oo):
     return -a*y + b*x*y*(1 - y/N_oo)
@@ -7,8 +9,9 @@ def x_prime(x, y, c, d, N_oo):
     return d*x*(1 - x/N_oo) - c*y*x*(1 - y/N_oo)
 
 board_size = 80 * 90
-points = 1000
+points = None           # Let the stream plotter choose the grid resolution
 padding = 10
+overlay_trials = 0      # Number of Wa-Tor simulations to draw on top of the field
 
 x_min = -padding
 x_max = board_size + padding
@@ -27,5 +30,8 @@ y_diff = lambda x, y: y_prime(x, y, a, b, board_size)
 x_diff = lambda x, y: x_prime(x, y, c, d, board_size)
 
 fig, ax = sp.create_stream_plot(x_min, x_max, x_points, y_min, y_max, y_points, y_diff, x_diff)
+if overlay_trials > 0:
+    series_list = [trial_runner.run_trial(default_parameters.parameters, seed) for seed in range(overlay_trials)]
+    sp.add_phase_trajectories(ax, series_list, color="tab:red", linewidth=0.5, alpha=0.5, rasterized=True)
 ax.set(xlabel="Fish Population", ylabel="Shark Population")
 fig.savefig("media/lvm_modified_stream_plot.svg")
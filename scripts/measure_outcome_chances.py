@@ -1,5 +1,8 @@
-import wa_tor
+import trial_runner
+import telemetry
 import default_parameters
+import result_cache
+import numpy as np
 import matplotlib.pyplot as plt
 
 # Specify the test values to use when testing each parameter
@@ -14,7 +17,19 @@ test_ranges = {
     "start_energy": range(1, default_parameters.parameters["breed_energy"] - 1),
 }
 
-def test_outcome_chances(target_param, test_values, trials, params=None):
+def classify_outcome(fish_counts, shark_counts, size):
+    """
+    Return which outcome a simulation on a board of the given size reached, based on its final populations.
+    The outcome is one of "everything_extinct", "fish_fill_board", or "still_going".
+    """
+    if fish_counts[-1] + shark_counts[-1] <= 0:
+        return "everything_extinct"
+    elif fish_counts[-1] == size:
+        return "fish_fill_board"
+    else:
+        return "still_going"
+
+def test_outcome_chances(target_param, test_values, trials, params=None, seed=None):
     """
     Vary the target parameter to have the given test values.
     For each value, run the simulation for the specified number of trials and calculate the chance of each of the possible outcomes.
@@ -40,36 +55,25 @@ def test_outcome_chances(target_param, test_values, trials, params=None):
         params[target_param] = value
 
         # Calculate the board dimensions based on board area and aspect ratio
-        # h*w = Area; h*Ratio = w
-        # h**2 * Ratio = Area
-        h = int((params["board_area"] / params["aspect_ratio"])**0.5)
-        w = int(h * params["aspect_ratio"])
-        dims = (h, w)
-
-        # Extract the needed parameters for later steps
-        init_params = default_parameters.get_initialization_parameters(params)
-        sim_params = default_parameters.get_simulation_parameters(params)
+        dims = default_parameters.get_board_dimensions(params)
         # Keep track of the counts for the possible outcomes
         everything_extinct_count = 0
         fish_fill_count = 0
 
-        for _ in range(trials):
-            # Initialize the game array
-            initial_game_array = wa_tor.create_empty_game_array(dims)
-            if params["use_basic_setup"]:
-                wa_tor.initialize_game_array_randomly(initial_game_array, **init_params)
-            else:
-                wa_tor.initialize_game_array_circular(initial_game_array, **init_params)
-
-            # Run the simulation
-            fish_counts, shark_counts = wa_tor.run_simulation_minimal(initial_game_array, **sim_params)
+        for trial in range(trials):
+            # Initialize the game array and run the simulation
+            # Trial k uses the seed (seed, k), like the sweeps in experiment_scheduler
+            trial_seed = None if seed is None else [seed, trial]
+            fish_counts, shark_counts = trial_runner.run_trial(params, trial_seed)
+            telemetry.emit("trial_finished", target_param=target_param, value=value, trial=trial + 1, trials=trials)
 
             # Check whether fish filled the board or if sharks and fish both went extinct
             # Update the counts for these events
             size = dims[0] * dims[1]
-            if fish_counts[-1] + shark_counts[-1] <= 0:
+            outcome = classify_outcome(fish_counts, shark_counts, size)
+            if outcome == "everything_extinct":
                 everything_extinct_count += 1
-            elif fish_counts[-1] == size:
+            elif outcome == "fish_fill_board":
                 fish_fill_count += 1
 
         # Store the chances of each possible outcome
@@ -80,13 +84,32 @@ def test_outcome_chances(target_param, test_values, trials, params=None):
 
     return overall_chances
 
-def plot_and_test_outcome_chances(fname, target_param, test_values, trials, params=None):
+def plot_and_test_outcome_chances(fname, target_param, test_values, trials, params=None, seed=None, use_saved_result=True):
     """
     Run the function test_outcome_chances() with the given arguments, then plot the results.
-    Save the figure at the given file name.
+    Save the figure at the given file name, and save the results next to it.
+    If the results saved there came from the same arguments (and a seed was given), redraw them instead of running the simulations again.
     """
-    outcome_chances = test_outcome_chances(target_param, test_values, trials, params)
+    # Set the parameters to the default if not specified
+    if params is None:
+        params = default_parameters.parameters.copy()
 
+    # Unseeded trials are never repeated exactly, so their results are saved but not reused
+    fingerprint = result_cache.get_fingerprint("outcome_chances", target_param, test_values, trials, params, seed)
+    outcome_chances = None
+    if use_saved_result and seed is not None:
+        outcome_chances = result_cache.load_result(fname, fingerprint)
+    if outcome_chances is None:
+        outcome_chances = test_outcome_chances(target_param, test_values, trials, params, seed)
+        result_cache.save_result(fname, fingerprint, outcome_chances, target_param=target_param, test_values=list(test_values), trials=trials, seed=seed)
+    plot_outcome_chances(fname, target_param, test_values, outcome_chances)
+
+def plot_outcome_chances(fname, target_param, test_values, outcome_chances):
+    """
+    Plot the chance of each outcome against the test values of the target parameter.
+    The outcome chances should be in the form returned by test_outcome_chances().
+    Save the figure at the given file name.
+    """
     fig, ax = plt.subplots()
     ax.plot(test_values, outcome_chances["everything_extinct"], "o", label="Both Extinct")
     ax.plot(test_values, outcome_chances["fish_fill_board"], "^", label="Sharks Extinct")
@@ -95,20 +118,20 @@ def plot_and_test_outcome_chances(fname, target_param, test_values, trials, para
     ax.legend()
     fig.tight_layout()
     fig.savefig(fname)
+    plt.close(fig)
 
-def run_standard_test(target_parameter, use_basic_setup):
+def plot_outcome_chance_heatmaps(fname, target_param, test_values, second_param, second_test_values, outcome_chances):
     """
-    Run a standard test on the target parameter.
-    Perform 25 trials with use_basic_setup optionally toggled.
+    Plot a heatmap of the chance of each outcome over every pair of test values of the two parameters.
+    Each list of outcome chances should have one chance per pair, with the first parameter changing fastest.
+    Save the figure at the given file name.
     """
-    trials = 25
-    test_values = test_ranges[target_parameter]
-    params = default_parameters.parameters.copy()
-    params["use_basic_setup"] = use_basic_setup
-
-    if use_basic_setup:
-        fname = f"media/outcome_chances_{target_parameter}.svg"
-    else:
-        fname = f"media/outcome_chances_{target_parameter}_circular.svg"
-
-    plot_and_test_outcome_chances(fname, target_parameter, test_values, trials, params)
+    fig, axes = plt.subplots(1, 3, figsize=(19.2, 4.8))
+    for ax, outcome, title in zip(axes, ["everything_extinct", "fish_fill_board", "still_going"], ["Both Extinct", "Sharks Extinct", "Neither Extinct"]):
+        chances = np.reshape(outcome_chances[outcome], (len(second_test_values), len(test_values)))
+        mesh = ax.pcolormesh(test_values, second_test_values, chances, shading="nearest", vmin=0, vmax=1)
+        ax.set(xlabel=target_param, ylabel=second_param, title=title)
+        fig.colorbar(mesh, ax=ax, label="Chance")
+    fig.tight_layout()
+    fig.savefig(fname)
+    plt.close(fig)
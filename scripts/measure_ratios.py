@@ -1,5 +1,8 @@
-import wa_tor
+import trial_runner
+import telemetry
 import default_parameters
+import result_cache
+import ensemble_statistics
 import numpy as np
 import matplotlib.pyplot as plt
 
@@ -62,7 +65,7 @@ def calculate_critical_points(fish_counts, shark_counts):
 
     return np.mean(x_crit_list), np.mean(y_crit_list)
 
-def test_lvm_ratios(target_param, test_values, trials, params=None):
+def test_lvm_ratios(target_param, test_values, trials, params=None, seed=None):
     """
     Vary the target parameter to have the given test values.
     For each value, run the simulation for the specified number of trials and calculate critical points (x = a/b & y = d/c) of the Lotka-Volterra model.
@@ -83,49 +86,54 @@ def test_lvm_ratios(target_param, test_values, trials, params=None):
         # Set the target parameter
         params[target_param] = value
 
-        # Calculate the board dimensions based on board area and aspect ratio
-        # h*w = Area; h*Ratio = w
-        # h**2 * Ratio = Area
-        h = int((params["board_area"] / params["aspect_ratio"])**0.5)
-        w = int(h * params["aspect_ratio"])
-        dims = (h, w)
-
-        # Extract the needed parameters for later steps
-        init_params = default_parameters.get_initialization_parameters(params)
-        sim_params = default_parameters.get_simulation_parameters(params)
-        # Keep track of the ratios found in each trial
-        a_b_ratios = []
-        d_c_ratios = []
-
-        for _ in range(trials):
-            # Initialize the game array
-            initial_game_array = wa_tor.create_empty_game_array(dims)
-            if params["use_basic_setup"]:
-                wa_tor.initialize_game_array_randomly(initial_game_array, **init_params)
-            else:
-                wa_tor.initialize_game_array_circular(initial_game_array, **init_params)
+        # Summarize the trials as they finish, instead of keeping every trial's ratios
+        dims = default_parameters.get_board_dimensions(params)
+        aggregator = ensemble_statistics.create_ensemble_aggregator(params["steps"], dims[0] * dims[1])
 
-            # Run the simulation
-            fish_counts, shark_counts = wa_tor.run_simulation_minimal(initial_game_array, **sim_params)
+        for trial in range(trials):
+            # Initialize the game array and run the simulation
+            # Trial k uses the seed (seed, k), like the sweeps in experiment_scheduler
+            trial_seed = None if seed is None else [seed, trial]
+            fish_counts, shark_counts = trial_runner.run_trial(params, trial_seed)
+            telemetry.emit("trial_finished", target_param=target_param, value=value, trial=trial + 1, trials=trials)
 
-            # Calculate the critical points
-            a_b, d_c = calculate_critical_points(fish_counts, shark_counts)
-            a_b_ratios.append(a_b)
-            d_c_ratios.append(d_c)
+            # Calculate the critical points and add them to the running means
+            ratios = calculate_critical_points(fish_counts, shark_counts)
+            ensemble_statistics.update_ensemble_aggregator(aggregator, fish_counts, shark_counts, ratios=ratios)
 
         # Store the average ratios found in the trials
-        overall_ratios["a/b"].append(np.nanmean(a_b_ratios))
-        overall_ratios["d/c"].append(np.nanmean(d_c_ratios))
+        ratios = ensemble_statistics.get_ensemble_ratios(aggregator)
+        overall_ratios["a/b"].append(ratios["a/b"][0])
+        overall_ratios["d/c"].append(ratios["d/c"][0])
 
     return overall_ratios
 
-def plot_and_test_lvm_ratios(fname, target_param, test_values, trials, params=None):
+def plot_and_test_lvm_ratios(fname, target_param, test_values, trials, params=None, seed=None, use_saved_result=True):
     """
-    Run the function test_outcome_chances() with the given arguments, then plot the results.
-    Save the figure at the given file name.
+    Run the function test_lvm_ratios() with the given arguments, then plot the results.
+    Save the figure at the given file name, and save the results next to it.
+    If the results saved there came from the same arguments (and a seed was given), redraw them instead of running the simulations again.
     """
-    lvm_ratios = test_lvm_ratios(target_param, test_values, trials, params)
+    # Set the parameters to the default if not specified
+    if params is None:
+        params = default_parameters.parameters.copy()
 
+    # Unseeded trials are never repeated exactly, so their results are saved but not reused
+    fingerprint = result_cache.get_fingerprint("lvm_ratios", target_param, test_values, trials, params, seed)
+    lvm_ratios = None
+    if use_saved_result and seed is not None:
+        lvm_ratios = result_cache.load_result(fname, fingerprint)
+    if lvm_ratios is None:
+        lvm_ratios = test_lvm_ratios(target_param, test_values, trials, params, seed)
+        result_cache.save_result(fname, fingerprint, lvm_ratios, target_param=target_param, test_values=list(test_values), trials=trials, seed=seed)
+    plot_lvm_ratios(fname, target_param, test_values, lvm_ratios)
+
+def plot_lvm_ratios(fname, target_param, test_values, lvm_ratios):
+    """
+    Plot the a/b and d/c ratios against the test values of the target parameter.
+    The ratios should be in the form returned by test_lvm_ratios().
+    Save the figure at the given file name.
+    """
     fig, axes = plt.subplots(1, 2, figsize=(12.8, 4.8))
 
     axes[0].plot(test_values, lvm_ratios["a/b"], "o")
@@ -136,20 +144,21 @@ def plot_and_test_lvm_ratios(fname, target_param, test_values, trials, params=No
     
     fig.tight_layout()
     fig.savefig(fname)
+    plt.close(fig)
 
-def run_standard_test(target_parameter, use_basic_setup):
+def plot_lvm_ratio_heatmaps(fname, target_param, test_values, second_param, second_test_values, lvm_ratios):
     """
-    Run a standard test on the target parameter.
-    Perform 25 trials with use_basic_setup optionally toggled.
+    Plot heatmaps of the a/b and d/c ratios over every pair of test values of the two parameters.
+    Each list of ratios should have one ratio per pair, with the first parameter changing fastest.
+    Pairs where no ratio could be estimated are left blank.
+    Save the figure at the given file name.
     """
-    trials = 25
-    test_values = test_ranges[target_parameter]
-    params = default_parameters.parameters.copy()
-    params["use_basic_setup"] = use_basic_setup
-
-    if use_basic_setup:
-        fname = f"media/lvm_ratios_{target_parameter}.svg"
-    else:
-        fname = f"media/lvm_ratios_{target_parameter}_circular.svg"
-
-    plot_and_test_lvm_ratios(fname, target_parameter, test_values, trials, params)
+    fig, axes = plt.subplots(1, 2, figsize=(12.8, 4.8))
+    for ax, ratio in zip(axes, ["a/b", "d/c"]):
+        ratios = np.reshape(lvm_ratios[ratio], (len(second_test_values), len(test_values)))
+        mesh = ax.pcolormesh(test_values, second_test_values, np.ma.masked_invalid(ratios), shading="nearest")
+        ax.set(xlabel=target_param, ylabel=second_param)
+        fig.colorbar(mesh, ax=ax, label=ratio)
+    fig.tight_layout()
+    fig.savefig(fname)
+    plt.close(fig)
@@ -0,0 +1,184 @@
+import wa_tor
+import numpy as np
+
+# Functions for running simulations on boards stored in files instead of memory
+# The board is processed in bands of rows. Each band is loaded with a one-row halo above and below it,
+# since a creature can only reach the rows next to its own. Cells are visited in a random order within each band,
+# and the bands are visited from top to bottom, so only one band (plus its halos) is in memory at a time.
+# Every creature is removed from the old board as it is visited, so after a step the old board is empty
+# and can be reused as the next new board. Two files are all a simulation of any length needs.
+
+def create_memmap_game_array(fname, dims):
+    """
+    Create an empty game array (filled with zeros) with the given dimensions, stored in the given file.
+    """
+    return np.memmap(fname, dtype=int, mode="w+", shape=dims)
+
+def open_memmap_game_array(fname, dims):
+    """
+    Open a game array with the given dimensions that was saved in the given file.
+    """
+    return np.memmap(fname, dtype=int, mode="r+", shape=dims)
+
+def get_band_ranges(rows, band_rows):
+    """
+    Return a list of (start, end) row ranges that split the given number of rows into bands.
+    """
+    return [(start, min(start + band_rows, rows)) for start in range(0, rows, band_rows)]
+
+def initialize_memmap_game_array_randomly(game_array, initial_fish, initial_sharks, breed_time, breed_energy, band_rows):
+    """
+    Randomly fill the game array with the given number of fish and sharks, one band at a time.
+    The number of each creature in a band is drawn so the overall placement is the same as initialize_game_array_randomly().
+    Each fish will be given a random time.
+    Each shark will be given a random amount of energy.
+    """
+    # Check that there are enough spaces to fit all the fish and sharks
+    assert game_array.size >= initial_fish + initial_sharks
+    rows, cols = game_array.shape
+    remaining = np.array([initial_fish, initial_sharks, game_array.size - initial_fish - initial_sharks])
+
+    for start, end in get_band_ranges(rows, band_rows):
+        # Decide how many fish and sharks land in this band, then shuffle them within it
+        band_size = (end - start) * cols
+        fish, sharks, _ = wa_tor.rng.multivariate_hypergeometric(remaining, band_size)
+        values = np.zeros(band_size, dtype=int)
+        values[:fish] = wa_tor.rng.integers(1, breed_time, size=fish, endpoint=True)
+        values[fish:fish + sharks] = wa_tor.rng.integers(-breed_energy, -1, size=sharks, endpoint=True)
+        wa_tor.rng.shuffle(values)
+        game_array[start:end] = values.reshape((end - start, cols))
+        remaining -= [fish, sharks, band_size - fish - sharks]
+
+def initialize_memmap_game_array_circular(game_array, initial_fish, initial_sharks, breed_time, breed_energy, band_rows):
+    """
+    Fill the game array with the given number of fish and sharks in a circular pattern, one band at a time.
+    Populate a central disk with sharks, and surround them with a ring of fish, like initialize_game_array_circular().
+    Each fish will be given a random time.
+    Each shark will be given a random amount of energy.
+    """
+    rows, cols = game_array.shape
+    row_center = rows / 2
+    col_center = cols / 2
+
+    for start, end in get_band_ranges(rows, band_rows):
+        y = np.arange(start, end)[:, None] - row_center
+        x = np.arange(cols)[None, :] - col_center
+        distance_squared = x**2 + y**2
+        # Check which positions are within the central shark disk and the surrounding fish ring
+        shark_mask = distance_squared < initial_sharks / np.pi
+        fish_mask = ~shark_mask & (distance_squared < (initial_sharks + initial_fish) / np.pi)
+
+        band = np.zeros((end - start, cols), dtype=int)
+        band[shark_mask] = wa_tor.rng.integers(-breed_energy, -1, size=shark_mask.sum(), endpoint=True)
+        band[fish_mask] = wa_tor.rng.integers(1, breed_time, size=fish_mask.sum(), endpoint=True)
+        game_array[start:end] = band
+
+def count_creatures_in_bands(game_array, band_rows):
+    """
+    Return the fish and shark counts of the game array, reading one band at a time.
+    """
+    fish_count = 0
+    shark_count = 0
+    for start, end in get_band_ranges(game_array.shape[0], band_rows):
+        band = np.asarray(game_array[start:end])
+        fish_count += wa_tor.count_fish(band)
+        shark_count += wa_tor.count_sharks(band)
+    return fish_count, shark_count
+
+def step_game_in_bands(old_array, new_array, band_rows, breed_time, energy_gain, breed_energy, start_energy, snapshot=None):
+    """
+    Increment the simulation by 1 step, one band of rows at a time.
+    The old array should hold the current state, and the new array should be empty.
+    Both arrays are modified in place: the new array receives the updates, and the old array is left empty.
+    If a snapshot array (such as a memmap of int8) is given, the sign of each cell of the new array is copied into it during the pass.
+    Return the fish and shark counts of the new array, which are also found during the pass.
+    """
+    rows, cols = old_array.shape
+    # Without room for distinct halo rows, fall back to the whole board at once
+    if band_rows > rows - 2:
+        band_rows = rows
+    bands = get_band_ranges(rows, band_rows)
+
+    fish_count = 0
+    shark_count = 0
+    for b, (start, end) in enumerate(bands):
+        if len(bands) == 1:
+            # The whole board fits in a single band, which wraps around on itself
+            row_indices = np.arange(rows)
+            interior = slice(0, rows)
+        else:
+            # Load the band with a halo row above and below it, wrapping around the torus
+            row_indices = np.arange(start - 1, end + 1) % rows
+            interior = slice(1, end - start + 1)
+        old_band = np.array(old_array[row_indices])
+        new_band = np.array(new_array[row_indices])
+        new_band_before = new_band.copy()
+
+        # Visit each interior cell in a random order
+        positions = wa_tor.rng.permutation((end - start) * cols)
+        for pos in positions:
+            loc = (pos // cols + interior.start, pos % cols)
+            wa_tor.update_location(old_band, new_band, loc, breed_time, energy_gain, breed_energy, start_energy)
+
+        old_array[row_indices] = old_band
+        new_array[row_indices] = new_band
+
+        # Count the interior rows, which are not loaded again until the next step
+        fish_count += wa_tor.count_fish(new_band[interior])
+        shark_count += wa_tor.count_sharks(new_band[interior])
+        if snapshot is not None:
+            snapshot[start:end] = np.sign(new_band[interior])
+
+        # Halo rows that belong to bands already counted were changed after their count, so correct for them
+        if len(bands) > 1:
+            finished_halos = []
+            if b > 0:
+                finished_halos.append(0)
+            if b == len(bands) - 1:
+                finished_halos.append(-1)
+            for halo in finished_halos:
+                fish_count += wa_tor.count_fish(new_band[halo]) - wa_tor.count_fish(new_band_before[halo])
+                shark_count += wa_tor.count_sharks(new_band[halo]) - wa_tor.count_sharks(new_band_before[halo])
+                if snapshot is not None:
+                    snapshot[row_indices[halo]] = np.sign(new_band[halo])
+
+    return fish_count, shark_count
+
+def run_simulation_out_of_core(game_array, scratch_fname, steps, breed_time, energy_gain, breed_energy, start_energy, band_rows=64, snapshot_every=None, snapshot_fname_format=None):
+    """
+    Run the simulation for the given number of steps on a file-backed game array, like run_simulation_minimal().
+    The scratch file holds the second board; the two boards swap roles every step.
+    If snapshot_every is given, save the sign of every cell (int8) every that many steps to .npy files.
+    The snapshot file name format should contain a field for the step number, such as "snapshots/step_{:05}.npy".
+    Return two lists containing the fish and shark populations at each step, and the game array holding the final state.
+    """
+    boards = [game_array, create_memmap_game_array(scratch_fname, game_array.shape)]
+    fish_count, shark_count = count_creatures_in_bands(game_array, band_rows)
+    fish_counts = [fish_count]
+    shark_counts = [shark_count]
+    progress = wa_tor.start_progress_reporting()
+
+    for k in range(steps):
+        old_array, new_array = boards
+        snapshot = None
+        if snapshot_every is not None and (k + 1) % snapshot_every == 0:
+            snapshot = np.lib.format.open_memmap(snapshot_fname_format.format(k + 1), mode="w+", dtype="int8", shape=game_array.shape)
+
+        fish_count, shark_count = step_game_in_bands(old_array, new_array, band_rows, breed_time, energy_gain, breed_energy, start_energy, snapshot)
+        fish_counts.append(fish_count)
+        shark_counts.append(shark_count)
+        if snapshot is not None:
+            snapshot.flush()
+            del snapshot
+        if progress is not None:
+            wa_tor.report_progress(progress, k + 1, steps)
+
+        # The emptied old array becomes the next new array
+        boards = [new_array, old_array]
+
+        # If the array is full of fish or both species have gone extinct, stop simulating early
+        if fish_count == game_array.size or fish_count + shark_count == 0:
+            break
+
+    boards[0].flush()
+    return fish_counts, shark_counts, boards[0]
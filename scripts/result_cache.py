@@ -0,0 +1,117 @@
+import os
+import ast
+import json
+import hashlib
+import collections
+
+# Functions for saving sweep results next to their figures, so figures can be redrawn without rerunning the simulations
+# Each result is saved as JSON with the same name as its figure (media/outcome_chances_breed_time.svg -> media/outcome_chances_breed_time.json).
+# A result is only reused when its fingerprint matches, which covers everything that affects the simulations:
+# the analysis, the target parameter and its test values, every other parameter, the trial count, the seed,
+# and the source code that runs the simulations and analyses them (but not the plotting code, so figures can be restyled).
+# Recently used results are also kept in memory, so interactive sessions do not even read the files.
+
+# The source files that produce the results, and the functions within them (None for the whole file)
+source_functions = {
+    "wa_tor.py": None,
+    "trial_runner.py": None,
+    "default_parameters.py": None,
+    "measure_outcome_chances.py": ["classify_outcome", "test_outcome_chances"],
+    "measure_ratios.py": ["find_local_maxima", "calculate_critical_points", "test_lvm_ratios"],
+    "ensemble_statistics.py": None,
+    "spatial_statistics.py": [
+        "get_radial_bins", "calculate_radial_correlation", "label_clusters", "calculate_cluster_statistics",
+        "compute_spatial_statistics", "create_spatial_observer", "calculate_correlation_length", "summarize_spatial_records",
+    ],
+    "experiment_scheduler.py": ["get_sweep_points", "get_sweep_parameters", "create_jobs", "run_job", "analyze_sweep"],
+}
+source_hash = None  # The hash of the source code above, found the first time it is needed
+memory_cache_size = 64      # The most results kept in memory at once
+memory_cache = collections.OrderedDict()    # Maps each fingerprint to its result, from least to most recently used
+
+def get_source_hash():
+    """
+    Return a hash (a hex string) of the source code listed in source_functions.
+    """
+    global source_hash
+    if source_hash is None:
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        hasher = hashlib.sha256()
+        for fname, function_names in source_functions.items():
+            with open(os.path.join(script_dir, fname)) as file:
+                source = file.read()
+            if function_names is not None:
+                # Only hash the listed functions, so changes elsewhere in the file keep the saved results
+                functions = {node.name: node for node in ast.parse(source).body if isinstance(node, ast.FunctionDef)}
+                source = "\n".join(ast.get_source_segment(source, functions[name]) for name in function_names)
+            hasher.update(fname.encode())
+            hasher.update(source.encode())
+        source_hash = hasher.hexdigest()
+    return source_hash
+
+def get_fingerprint(analysis, target_param, test_values, trials, params, seed, **extra):
+    """
+    Return a fingerprint (a hex string) identifying a sweep.
+    The value of the target parameter in the params is ignored, since the test values replace it.
+    Any extra keyword arguments (such as how often spatial statistics are observed) are included too.
+    """
+    description = {
+        "source": get_source_hash(),
+        "analysis": analysis,
+        "target_param": target_param,
+        "test_values": list(test_values),
+        "trials": trials,
+        "seed": seed,
+        "params": {key: value for key, value in params.items() if key != target_param},
+        "extra": extra,
+    }
+    text = json.dumps(description, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+def get_result_fname(figure_fname):
+    """
+    Return the file name where the result of the given figure is saved.
+    """
+    return os.path.splitext(figure_fname)[0] + ".json"
+
+def remember_result(fingerprint, result):
+    """
+    Keep a result in memory, dropping the least recently used one if there are too many.
+    """
+    memory_cache[fingerprint] = result
+    memory_cache.move_to_end(fingerprint)
+    while len(memory_cache) > memory_cache_size:
+        memory_cache.popitem(last=False)
+
+def load_result(figure_fname, fingerprint):
+    """
+    Return the saved result for the given figure if its fingerprint matches, or None otherwise.
+    Results kept in memory are returned without reading the file.
+    """
+    if fingerprint in memory_cache:
+        memory_cache.move_to_end(fingerprint)
+        return memory_cache[fingerprint]
+
+    result_fname = get_result_fname(figure_fname)
+    if not os.path.exists(result_fname):
+        return None
+    with open(result_fname) as file:
+        record = json.load(file)
+    if record.get("fingerprint") != fingerprint:
+        return None
+    remember_result(fingerprint, record["result"])
+    return record["result"]
+
+def save_result(figure_fname, fingerprint, result, **description):
+    """
+    Save a result next to the given figure along with its fingerprint, and keep it in memory.
+    The description (such as the test values, trial count, and seed) is saved alongside it for reference.
+    """
+    record = {"fingerprint": fingerprint}
+    record.update(description)
+    record["result"] = result
+    result_fname = get_result_fname(figure_fname)
+    os.makedirs(os.path.dirname(result_fname) or ".", exist_ok=True)
+    with open(result_fname, "w") as file:
+        json.dump(record, file, indent=1, default=float)
+    remember_result(fingerprint, result)
@@ -0,0 +1,16 @@
+import experiment_scheduler
+import telemetry
+
+metrics_fname = "output/run_experiments_metrics.jsonl"  # Where to save the progress and throughput events
+
+# Make every sweep figure used in project-1.typ with one pool of worker processes
+if __name__ == "__main__":
+    metrics_file = telemetry.subscribe_metrics_file(metrics_fname)
+    telemetry.subscribe(telemetry.print_sweep_progress)
+
+    try:
+        sweeps = experiment_scheduler.create_standard_sweeps()
+        experiment_scheduler.run_sweeps(sweeps)
+    finally:
+        telemetry.unsubscribe(telemetry.print_sweep_progress)
+        telemetry.close_metrics_file(metrics_file)
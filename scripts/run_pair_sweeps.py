@@ -0,0 +1,21 @@
+import experiment_scheduler
+import measure_outcome_chances
+import telemetry
+
+metrics_fname = "output/run_pair_sweeps_metrics.jsonl"  # Where to save the progress and throughput events
+
+# Make the outcome chance and ratio heatmaps for energy_gain against breed_energy
+# This runs thousands of simulations, so it is only built when asked for (make pair_sweeps)
+if __name__ == "__main__":
+    metrics_file = telemetry.subscribe_metrics_file(metrics_fname)
+    telemetry.subscribe(telemetry.print_sweep_progress)
+
+    try:
+        sweep = experiment_scheduler.create_pair_sweep(
+            "energy_gain", measure_outcome_chances.test_ranges["energy_gain"],
+            "breed_energy", measure_outcome_chances.test_ranges["breed_energy"],
+        )
+        experiment_scheduler.run_sweeps([sweep])
+    finally:
+        telemetry.unsubscribe(telemetry.print_sweep_progress)
+        telemetry.close_metrics_file(metrics_file)
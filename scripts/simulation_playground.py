@@ -1,3 +1,4 @@
+import os
 import wa_tor
 
 # Main parameters of the simulation
@@ -12,27 +13,38 @@ initial_sharks = 400    # Starting number of sharks
 steps = 500             # Time duration of the simulation
 start_energy = 9        # Number of moves a child shark begins with
 use_basic_setup = True  # Whether to use a random initial distribution (or not)
+use_pipelined_rendering = True  # Whether to encode the animation while the simulation runs (or afterwards)
 
-# Initialize the game array
-initial_game_array = wa_tor.create_empty_game_array(dims)
-if use_basic_setup:
-    wa_tor.initialize_game_array_randomly(initial_game_array, initial_fish, initial_sharks, breed_time, breed_energy)
-else:
-    wa_tor.initialize_game_array_circular(initial_game_array, initial_fish, initial_sharks, breed_time, breed_energy)
+# The renderer runs in a separate process, which may re-import this script
+if __name__ == "__main__":
+    # Initialize the game array
+    initial_game_array = wa_tor.create_empty_game_array(dims)
+    if use_basic_setup:
+        wa_tor.initialize_game_array_randomly(initial_game_array, initial_fish, initial_sharks, breed_time, breed_energy)
+    else:
+        wa_tor.initialize_game_array_circular(initial_game_array, initial_fish, initial_sharks, breed_time, breed_energy)
 
-# Run the Simulation
-print("Playing game...")
-game_array_list = wa_tor.run_simulation(initial_game_array, steps, breed_time, energy_gain, breed_energy, start_energy, print_progress=True)
-print("\nSimulation finished")
+    paramater_str = wa_tor.create_simulation_paramater_str(dims, breed_time, energy_gain, breed_energy, start_energy, initial_fish, initial_sharks)
+    # The step count is not known until the simulation ends, so write the animation to a temporary name first
+    partial_animation_fname = f"media/TestAnimation_{paramater_str}_partial.gif"
 
-# Create an animation and plots
-actual_steps = len(game_array_list)
-fish_counts = [wa_tor.count_fish(game_array) for game_array in game_array_list]
-shark_counts = [wa_tor.count_sharks(game_array) for game_array in game_array_list]
+    # Run the Simulation
+    print("Playing game...")
+    if use_pipelined_rendering:
+        fish_counts, shark_counts = wa_tor.run_simulation_with_animation(initial_game_array, steps, breed_time, energy_gain, breed_energy, start_energy, partial_animation_fname, print_progress=True)
+    else:
+        game_array_list = wa_tor.run_simulation(initial_game_array, steps, breed_time, energy_gain, breed_energy, start_energy, print_progress=True)
+        fish_counts = [wa_tor.count_fish(game_array) for game_array in game_array_list]
+        shark_counts = [wa_tor.count_sharks(game_array) for game_array in game_array_list]
+    print("\nSimulation finished")
 
-paramater_str = wa_tor.create_simulation_paramater_str(dims, breed_time, energy_gain, breed_energy, start_energy, initial_fish, initial_sharks)
-animation_fname = f"media/TestAnimation_{paramater_str}_{actual_steps}.gif"
-plot_fname = f"media/TestPlot_{paramater_str}_{actual_steps}.png"
+    # Create an animation and plots
+    actual_steps = len(fish_counts)
+    animation_fname = f"media/TestAnimation_{paramater_str}_{actual_steps}.gif"
+    plot_fname = f"media/TestPlot_{paramater_str}_{actual_steps}.png"
 
-wa_tor.create_simulation_animation(game_array_list, animation_fname)
-wa_tor.create_simulation_plots(fish_counts, shark_counts, plot_fname)
+    if use_pipelined_rendering:
+        os.replace(partial_animation_fname, animation_fname)
+    else:
+        wa_tor.create_simulation_animation(game_array_list, animation_fname)
+    wa_tor.create_simulation_plots(fish_counts, shark_counts, plot_fname)
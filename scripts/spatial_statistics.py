@@ -0,0 +1,179 @@
+import numpy as np
+import matplotlib.pyplot as plt
+
+# Functions for measuring the spatial structure of a game array while the simulation runs
+# Everything is computed on the torus: correlations use FFTs (which wrap around by nature),
+# and clusters are labeled with whole-array operations that wrap with np.roll.
+
+# Keys of summarize_spatial_records() that hold a time series, which sweeps average into one value per trial
+sweep_summary_keys = [
+    "fish_correlation_length",
+    "shark_correlation_length",
+    "fish_mean_cluster_size",
+    "shark_mean_cluster_size",
+    "cross_correlation_at_zero",
+]
+
+radial_bins_cache = {}  # Radial bin data for each board shape, since every step of a run uses the same shape
+
+def get_radial_bins(shape):
+    """
+    Return the radius bin of each offset on a torus of the given shape, and the number of offsets in each bin.
+    The radius is the distance to the nearest copy of the offset, rounded to the nearest integer.
+    """
+    if shape not in radial_bins_cache:
+        rows, cols = shape
+        i = np.arange(rows)
+        j = np.arange(cols)
+        dy = np.minimum(i, rows - i)[:, None]
+        dx = np.minimum(j, cols - j)[None, :]
+        bins = np.rint(np.sqrt(dx**2 + dy**2)).astype(int)
+        counts = np.bincount(bins.ravel())
+        radial_bins_cache[shape] = (bins.ravel(), counts)
+    return radial_bins_cache[shape]
+
+def calculate_radial_correlation(field_1, field_2):
+    """
+    Return the radially averaged correlation between the fluctuations of two fields on the torus.
+    Element r of the result is the correlation between points that are r cells apart.
+    Passing the same field twice gives its autocorrelation, which is 1 at r = 0.
+    If either field is constant, the correlation is undefined and the result is all NaN.
+    """
+    fluctuation_1 = field_1 - field_1.mean()
+    fluctuation_2 = field_2 - field_2.mean()
+    bins, counts = get_radial_bins(field_1.shape)
+    normalization = np.sqrt((fluctuation_1**2).mean() * (fluctuation_2**2).mean())
+    if normalization == 0:
+        return np.full(counts.shape, np.nan)
+
+    # Correlation theorem: the inverse transform of F1 * conj(F2) sums f1(x + r) * f2(x) over all x
+    spectrum = np.fft.rfft2(fluctuation_1) * np.conj(np.fft.rfft2(fluctuation_2))
+    correlation = np.fft.irfft2(spectrum, s=field_1.shape) / field_1.size / normalization
+
+    # Average the correlation over all offsets with the same radius
+    return np.bincount(bins, weights=correlation.ravel()) / counts
+
+def label_clusters(mask):
+    """
+    Label the connected clusters of True cells in the mask, where cells connect up, down, left, and right across the torus edges.
+    Each cluster is labeled with the smallest flat index of its cells, and False cells are labeled with mask.size.
+    Labels spread to neighboring cells, and each cell then jumps to its label's label, which takes few whole-array passes.
+    Return the array of labels.
+    """
+    empty_label = mask.size
+    labels = np.where(mask, np.arange(mask.size).reshape(mask.shape), empty_label)
+    while True:
+        # Take the smallest label among each cell and its neighbors
+        new_labels = labels
+        for shift, axis in [(1, 0), (-1, 0), (1, 1), (-1, 1)]:
+            new_labels = np.minimum(new_labels, np.roll(labels, shift, axis=axis))
+        new_labels = np.where(mask, new_labels, empty_label)
+
+        # Jump each label to the label of the cell it points at
+        flat_labels = np.append(new_labels.ravel(), empty_label)
+        flat_labels = flat_labels[flat_labels]
+        flat_labels = flat_labels[flat_labels]
+        new_labels = flat_labels[:-1].reshape(mask.shape)
+
+        if np.array_equal(new_labels, labels):
+            return labels
+        labels = new_labels
+
+def calculate_cluster_statistics(mask):
+    """
+    Return a dictionary describing the sizes of the connected clusters of True cells in the mask:
+    - "count": the number of clusters
+    - "mean_size" and "max_size": the mean and largest cluster sizes
+    - "size_histogram": the number of clusters with sizes in [1, 2), [2, 4), [4, 8), and so on
+    """
+    bins = int(np.log2(max(mask.size, 1))) + 1
+    labels = label_clusters(mask)
+    sizes = np.bincount(labels[mask])
+    sizes = sizes[sizes > 0]
+    if sizes.size == 0:
+        return {"count": 0, "mean_size": 0.0, "max_size": 0, "size_histogram": np.zeros(bins, dtype=int)}
+    return {
+        "count": sizes.size,
+        "mean_size": sizes.mean(),
+        "max_size": sizes.max(),
+        "size_histogram": np.bincount(np.log2(sizes).astype(int), minlength=bins),
+    }
+
+def compute_spatial_statistics(game_array):
+    """
+    Return a dictionary of spatial statistics for the game array:
+    - the radially averaged fish and shark autocorrelations, and their cross-correlation
+    - the cluster statistics of the fish and the sharks
+    Fish are represented by positive values, sharks by negative values, and empty spaces by 0.
+    """
+    fish = (game_array > 0).astype(float)
+    sharks = (game_array < 0).astype(float)
+    return {
+        "fish_autocorrelation": calculate_radial_correlation(fish, fish),
+        "shark_autocorrelation": calculate_radial_correlation(sharks, sharks),
+        "cross_correlation": calculate_radial_correlation(fish, sharks),
+        "fish_clusters": calculate_cluster_statistics(fish > 0),
+        "shark_clusters": calculate_cluster_statistics(sharks > 0),
+    }
+
+def create_spatial_observer(records, every=1):
+    """
+    Return an observer for run_simulation_minimal() that computes the spatial statistics every given number of steps.
+    Each result is appended to the given list along with its "step".
+    """
+    def observe(step, game_array):
+        if step % every == 0:
+            record = compute_spatial_statistics(game_array)
+            record["step"] = step
+            records.append(record)
+    return observe
+
+def calculate_correlation_length(correlation):
+    """
+    Return the first radius where the radially averaged correlation falls below 1/e, or NaN if it never does.
+    """
+    below = np.nonzero(correlation < np.exp(-1))[0]
+    return below[0] if below.size > 0 else np.nan
+
+def summarize_spatial_records(records):
+    """
+    Condense the records of a run into compact time series and averages, which are small enough to keep for every trial of a sweep.
+    Return a dictionary with:
+    - "steps": the steps that were observed
+    - the fish and shark correlation lengths, the fish-shark cross-correlation at r = 0, and the mean cluster sizes at those steps
+    - the radial correlations and cluster size histograms averaged over the observed steps
+    """
+    summary = {"steps": np.array([record["step"] for record in records])}
+    for species in ["fish", "shark"]:
+        summary[f"{species}_correlation_length"] = np.array([calculate_correlation_length(record[f"{species}_autocorrelation"]) for record in records])
+        summary[f"{species}_mean_cluster_size"] = np.array([record[f"{species}_clusters"]["mean_size"] for record in records])
+        summary[f"{species}_autocorrelation"] = np.nanmean([record[f"{species}_autocorrelation"] for record in records], axis=0)
+        summary[f"{species}_cluster_histogram"] = np.mean([record[f"{species}_clusters"]["size_histogram"] for record in records], axis=0)
+    summary["cross_correlation_at_zero"] = np.array([record["cross_correlation"][0] for record in records])
+    summary["cross_correlation"] = np.nanmean([record["cross_correlation"] for record in records], axis=0)
+    return summary
+
+def plot_spatial_statistics(fname, target_param, test_values, spatial_results):
+    """
+    Plot the average correlation lengths, cluster sizes, and fish-shark cross-correlation against the test values of the target parameter.
+    The results should map each of the sweep summary keys to a list with one value per test value.
+    Save the figure at the given file name.
+    """
+    fig, axes = plt.subplots(1, 3, figsize=(12.8, 4.8))
+
+    axes[0].plot(test_values, spatial_results["fish_correlation_length"], "o", label="Fish")
+    axes[0].plot(test_values, spatial_results["shark_correlation_length"], "^", label="Sharks")
+    axes[0].set(xlabel=target_param, ylabel="Correlation Length")
+    axes[0].legend()
+
+    axes[1].plot(test_values, spatial_results["fish_mean_cluster_size"], "o", label="Fish")
+    axes[1].plot(test_values, spatial_results["shark_mean_cluster_size"], "^", label="Sharks")
+    axes[1].set(xlabel=target_param, ylabel="Mean Cluster Size")
+    axes[1].legend()
+
+    axes[2].plot(test_values, spatial_results["cross_correlation_at_zero"], "o")
+    axes[2].set(xlabel=target_param, ylabel="Fish-Shark Cross-Correlation")
+
+    fig.tight_layout()
+    fig.savefig(fname)
+    plt.close(fig)
@@ -1,25 +1,126 @@
+import lvm_fitting
 import numpy as np
 import matplotlib.pyplot as plt
 
-def create_stream_plot(x_min, x_max, x_points, y_min, y_max, y_points, numerator, denominator=(lambda x, y: 1)):
+from matplotlib.collections import LineCollection
+
+def evaluate_direction_field(x_values, y_values, numerator, denominator):
+    """
+    Evaluate the unit direction field of dy/dx = numerator/denominator on the grid formed by the given values.
+    Return the x and y components of the arrows.
+    """
+    x, y = np.meshgrid(x_values, y_values, sparse=True)
+    top = numerator(x, y) * np.ones_like(x * y)
+    bottom = denominator(x, y) * np.ones_like(x * y)
+    magnitude = np.sqrt(top**2 + bottom**2)
+    x_arrows = bottom / magnitude
+    y_arrows = top / magnitude
+    return x_arrows, y_arrows
+
+def choose_grid_points(x_min, x_max, y_min, y_max, numerator, denominator, start_points=33, max_points=1025, tolerance=0.02):
+    """
+    Return the number of grid points to use in each direction.
+    Start with a coarse grid, and keep doubling its resolution until the new midpoints agree with interpolating the previous grid.
+    Agreement means the arrows differ by less than the tolerance (roughly in radians) at almost every midpoint.
+    """
+    points = start_points
+    while points < max_points:
+        finer_points = 2 * points - 1
+        x_values = np.linspace(x_min, x_max, finer_points)
+        y_values = np.linspace(y_min, y_max, finer_points)
+        x_arrows, y_arrows = evaluate_direction_field(x_values, y_values, numerator, denominator)
+
+        # Compare the cell centers to the average of the four surrounding coarse corners
+        differences = []
+        for arrows in [x_arrows, y_arrows]:
+            corners = arrows[::2, ::2]
+            interpolated = (corners[:-1, :-1] + corners[1:, :-1] + corners[:-1, 1:] + corners[1:, 1:]) / 4
+            differences.append(arrows[1::2, 1::2] - interpolated)
+        error = np.sqrt(differences[0]**2 + differences[1]**2)
+
+        # Ignore the few cells around critical points, where the direction is undefined
+        if np.nanpercentile(error, 99) < tolerance:
+            break
+        points = finer_points
+
+    return points
+
+def create_stream_plot(x_min, x_max, x_points, y_min, y_max, y_points, numerator, denominator=(lambda x, y: 1), density=1, rasterized=False):
     """
     Create a stream plot for the differential equation dy/dx = numerator/denominator.
     Numerator and denominator are functions that take two inputs (x, y) and return a value.
     Denominator defaults to returning 1 regardless of input.
     The grid should have the specified number of points in the x-direction and y-direction within the specified ranges.
+    If the number of points is None, choose it with choose_grid_points().
+    The density is passed on to ax.streamplot().
+    If rasterized is True, the streamlines are saved as an image inside vector formats, which makes much smaller files.
     Return the figure and axes created.
     """
+    if x_points is None or y_points is None:
+        points = choose_grid_points(x_min, x_max, y_min, y_max, numerator, denominator)
+        x_points = points if x_points is None else x_points
+        y_points = points if y_points is None else y_points
+
     x_values = np.linspace(x_min, x_max, x_points)
     y_values = np.linspace(y_min, y_max, y_points)
-    x, y = np.meshgrid(x_values, y_values, sparse=True)
-
-    top = numerator(x, y)
-    bottom = denominator(x, y)
-    magnitude = np.sqrt(top**2 + bottom**2)
-    x_arrows = bottom / magnitude
-    y_arrows = top / magnitude
+    x_arrows, y_arrows = evaluate_direction_field(x_values, y_values, numerator, denominator)
 
     fig, ax = plt.subplots()
-    ax.streamplot(x_values, y_values, x_arrows, y_arrows)
+    stream = ax.streamplot(x_values, y_values, x_arrows, y_arrows, density=density)
+    stream.lines.set_rasterized(rasterized)
+    stream.arrows.set_rasterized(rasterized)
 
     return fig, ax
+
+def add_lvm_trajectories(ax, coefficients, initial_points, carrying_capacity=None, periods=1, points_per_period=200, max_periods=20, **plot_kwargs):
+    """
+    Draw Lotka-Volterra trajectories from each of the given (x0, y0) initial points on the axes.
+    The coefficients are (a, b, c, d), in the same form as lvm_fitting.
+    Each trajectory goes around the given number of times, ending where it started (or, for spirals, level with its start).
+    Only the path matters, not the timing, so the coefficients are rescaled to give points_per_period points per small-oscillation period.
+    Larger orbits take longer to go around, so all the trajectories are integrated together for up to max_periods small-oscillation periods,
+    and then each is cut where it comes back around. A trajectory that never does is drawn in full.
+    Additional keyword arguments are passed on to the LineCollection.
+    Return the LineCollection added.
+    """
+    a, b, c, d = coefficients
+    # Scaling all the coefficients by the same factor only changes the speed along each path
+    scale = 2 * np.pi / (np.sqrt(a * d) * points_per_period)
+    scaled_coefficients = np.array(coefficients, dtype=float) * scale
+    x0, y0 = np.array(initial_points, dtype=float).T
+
+    fish, sharks = lvm_fitting.integrate_lvm_trajectories(scaled_coefficients, x0, y0, max_periods * points_per_period, carrying_capacity)
+    (x_prime, y_prime), _, _ = lvm_fitting.lvm_derivatives(x0, y0, scaled_coefficients, carrying_capacity)
+
+    paths = []
+    for k in range(len(x0)):
+        path = np.stack([fish[:, k], sharks[:, k]], axis=-1)
+        # Watch whichever population is changing faster (relative to its size) at the start
+        # The path has gone around once each time it crosses back over its starting value in the same direction
+        axis = 0 if abs(x_prime[k] / x0[k]) >= abs(y_prime[k] / y0[k]) else 1
+        direction = np.sign([x_prime[k], y_prime[k]][axis])
+        offsets = direction * (path[:, axis] - path[0, axis])
+        crossings = np.nonzero((offsets[1:-1] <= 0) & (offsets[2:] > 0))[0] + 1
+        if direction != 0 and len(crossings) >= periods:
+            # Cut the path at the crossing, placing the last point on the starting value
+            t = crossings[periods - 1]
+            fraction = -offsets[t] / (offsets[t + 1] - offsets[t])
+            end_point = path[t] + fraction * (path[t + 1] - path[t])
+            path = np.vstack([path[:t + 1], end_point])
+        paths.append(path)
+
+    line_collection = LineCollection(paths, **plot_kwargs)
+    ax.add_collection(line_collection)
+    return line_collection
+
+def add_phase_trajectories(ax, series_list, **plot_kwargs):
+    """
+    Draw the simulated (fish, shark) populations of each trial on the axes, such as the results of trial_runner.run_trial().
+    All the trials are drawn as a single LineCollection.
+    Additional keyword arguments are passed on to the LineCollection.
+    Return the LineCollection added.
+    """
+    paths = [np.column_stack([fish_counts, shark_counts]) for fish_counts, shark_counts in series_list]
+    line_collection = LineCollection(paths, **plot_kwargs)
+    ax.add_collection(line_collection)
+    return line_collection
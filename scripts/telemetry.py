@@ -0,0 +1,202 @@
+import os
+import json
+import time
+import threading
+import multiprocessing as mp
+
+# Telemetry events are dictionaries with an "event" name, a "time", the "pid" of the process that made them, and any other fields.
+# Events are only built when something is subscribed, so checking `if telemetry.subscribers:` is all the inner loops pay otherwise.
+
+subscribers = []    # Functions called with each event
+
+def subscribe(callback):
+    """
+    Call the given function with every future event.
+    """
+    subscribers.append(callback)
+
+def unsubscribe(callback):
+    """
+    Stop calling the given function with events.
+    """
+    subscribers.remove(callback)
+
+def emit(event, **fields):
+    """
+    Send an event with the given name and fields to every subscriber.
+    Do nothing if there are no subscribers.
+    """
+    if not subscribers:
+        return
+    record = {"event": event, "time": time.time(), "pid": os.getpid()}
+    record.update(fields)
+    for callback in subscribers:
+        callback(record)
+
+def create_rate_limiter(interval):
+    """
+    Return a rate limiter that allows one report per interval (in seconds).
+    """
+    return {"interval": interval, "next_time": 0}
+
+def should_report(rate_limiter):
+    """
+    Return whether enough time has passed since the last allowed report.
+    """
+    now = time.monotonic()
+    if now < rate_limiter["next_time"]:
+        return False
+    rate_limiter["next_time"] = now + rate_limiter["interval"]
+    return True
+
+# Functions for subscribers that save or show events
+
+def subscribe_metrics_file(fname, mode="w"):
+    """
+    Write every event to the given file as a line of JSON.
+    The file is replaced, unless the mode is "a" to append to it.
+    Return the subscribed function, which closes the file when passed to close_metrics_file().
+    """
+    os.makedirs(os.path.dirname(fname) or ".", exist_ok=True)
+    file = open(fname, mode)
+    lock = threading.Lock()
+
+    def write_record(record):
+        with lock:
+            file.write(json.dumps(record, default=str) + "\n")
+            file.flush()
+
+    write_record.file = file
+    subscribe(write_record)
+    return write_record
+
+def close_metrics_file(write_record):
+    """
+    Unsubscribe a function created by subscribe_metrics_file() and close its file.
+    """
+    unsubscribe(write_record)
+    write_record.file.close()
+
+def print_sweep_progress(record):
+    """
+    Print a one line summary of sweep progress events, ignoring all other events.
+    """
+    if record["event"] != "sweep_progress":
+        return
+    eta = record["eta_seconds"]
+    eta_str = "?" if eta is None else f"{eta / 60:.1f} min"
+    utilization = record["worker_utilization"]
+    mean_utilization = sum(utilization.values()) / max(len(utilization), 1)
+    print(f"{record['jobs_finished']}/{record['jobs_total']} simulations, {record['steps_per_second']:.1f} steps/s, ETA {eta_str}, {mean_utilization:.0%} worker utilization", flush=True)
+
+# Functions for passing events from worker processes back to the main process
+
+def start_worker_channel():
+    """
+    Start forwarding events sent by worker processes to this process's subscribers.
+    Return the channel, or None if nothing is subscribed (in which case the workers should not send anything).
+    Pass channel["queue"] (or None) to attach_worker_channel() in each worker, such as with a pool initializer.
+    """
+    if not subscribers:
+        return None
+    queue = mp.Queue()
+
+    def forward_records():
+        while True:
+            record = queue.get()
+            if record is None:
+                break
+            for callback in subscribers:
+                callback(record)
+
+    thread = threading.Thread(target=forward_records, daemon=True)
+    thread.start()
+    return {"queue": queue, "thread": thread}
+
+def stop_worker_channel(channel):
+    """
+    Forward any remaining events, then stop the channel.
+    """
+    if channel is None:
+        return
+    channel["queue"].put(None)
+    channel["thread"].join()
+
+def attach_worker_channel(queue):
+    """
+    In a worker process, send all events to the main process through the given queue.
+    If the queue is None, telemetry stays off in the worker.
+    """
+    subscribers.clear()
+    if queue is not None:
+        subscribe(queue.put)
+
+# Functions for tracking the progress of a set of jobs
+
+def create_progress_tracker(total_jobs, total_cost, label_totals, interval=10):
+    """
+    Create a tracker for a set of jobs with the given total count and total estimated cost.
+    The label totals map a label (such as a parameter value) to the number of trials it needs.
+    Progress events are sent at most once per interval (in seconds).
+    """
+    return {
+        "start_time": time.monotonic(),
+        "jobs_total": total_jobs,
+        "jobs_finished": 0,
+        "cost_total": total_cost,
+        "cost_finished": 0,
+        "steps_finished": 0,
+        "label_totals": label_totals,
+        "label_counts": {label: 0 for label in label_totals},
+        "worker_busy_seconds": {},
+        "rate_limiter": create_rate_limiter(interval),
+    }
+
+def record_job_finished(tracker, cost, steps, seconds, pid, labels):
+    """
+    Update the tracker with a finished job.
+    Pass the job's estimated cost, the steps it simulated, how long it took, which worker ran it, and the labels it counts toward.
+    Send a "value_finished" event for each label that now has all its trials.
+    Send a rate-limited "sweep_progress" event with the throughput, ETA, and worker utilization.
+    """
+    tracker["jobs_finished"] += 1
+    tracker["cost_finished"] += cost
+    tracker["steps_finished"] += steps
+    tracker["worker_busy_seconds"][pid] = tracker["worker_busy_seconds"].get(pid, 0) + seconds
+
+    for label in labels:
+        tracker["label_counts"][label] += 1
+        if tracker["label_counts"][label] == tracker["label_totals"][label]:
+            emit("value_finished", label=label, trials=tracker["label_totals"][label])
+
+    if not subscribers:
+        return
+
+    done = tracker["jobs_finished"] == tracker["jobs_total"]
+    if should_report(tracker["rate_limiter"]) or done:
+        emit("sweep_progress", **get_progress_summary(tracker))
+
+def get_progress_summary(tracker):
+    """
+    Return a dictionary summarizing the tracker's progress.
+    """
+    elapsed = max(time.monotonic() - tracker["start_time"], 1e-9)
+    # Estimate the remaining time from the estimated cost of the remaining jobs
+    cost_rate = tracker["cost_finished"] / elapsed
+    eta = (tracker["cost_total"] - tracker["cost_finished"]) / cost_rate if cost_rate > 0 else None
+
+    utilization = {str(pid): busy / elapsed for pid, busy in tracker["worker_busy_seconds"].items()}
+    in_progress = {}
+    for label, count in tracker["label_counts"].items():
+        if 0 < count < tracker["label_totals"][label]:
+            in_progress[label] = f"{count}/{tracker['label_totals'][label]}"
+
+    return {
+        "jobs_finished": tracker["jobs_finished"],
+        "jobs_total": tracker["jobs_total"],
+        "elapsed_seconds": elapsed,
+        "steps_per_second": tracker["steps_finished"] / elapsed,
+        "eta_seconds": eta,
+        "worker_utilization": utilization,
+        "trials_finished": in_progress,
+    }
@@ -1,3 +0,0 @@
-import measure_outcome_chances as tst
-
-tst.run_standard_test("aspect_ratio", True)
@@ -1,3 +0,0 @@
-import measure_ratios as tst
-
-tst.run_standard_test("breed_energy", False)
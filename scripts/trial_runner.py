@@ -0,0 +1,31 @@
+import wa_tor
+import default_parameters
+
+def create_initial_game_array(params):
+    """
+    Create a game array with the dimensions described by the parameters.
+    Fill it randomly or in a circular pattern depending on use_basic_setup.
+    """
+    dims = default_parameters.get_board_dimensions(params)
+    init_params = default_parameters.get_initialization_parameters(params)
+
+    game_array = wa_tor.create_empty_game_array(dims)
+    if params["use_basic_setup"]:
+        wa_tor.initialize_game_array_randomly(game_array, **init_params)
+    else:
+        wa_tor.initialize_game_array_circular(game_array, **init_params)
+    return game_array
+
+def run_trial(params, seed=None, observer=None):
+    """
+    Initialize a game array and run the simulation with the given parameters.
+    If a seed is given, reseed the random number generator first so the trial is reproducible.
+    The observer is passed on to run_simulation_minimal().
+    Return two lists containing the fish and shark populations at each step.
+    """
+    if seed is not None:
+        wa_tor.seed_rng(seed)
+
+    initial_game_array = create_initial_game_array(params)
+    sim_params = default_parameters.get_simulation_parameters(params)
+    return wa_tor.run_simulation_minimal(initial_game_array, **sim_params, observer=observer)
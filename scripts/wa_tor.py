@@ -3,6 +3,10 @@
 import numpy as np              # Library needed for numerical functions
 import matplotlib.pyplot as plt # Library needed to plot results
 import imageio.v2 as io         # Library for converting a collection of image files to a gif
+import multiprocessing as mp    # Library for rendering in a separate process
+import queue                    # Library needed for the exception raised by a full queue
+import time                     # Library needed to measure simulation speed
+import telemetry                # Module for reporting progress to any subscribers
 rng = np.random.default_rng()   # Random number generator
 
 from matplotlib.collections import LineCollection
@@ -18,6 +22,7 @@ def run_simulation(game_array, steps, breed_time, energy_gain, breed_energy, sta
     """
     game_array_list = [game_array]
     percent = 0
+    progress = start_progress_reporting()
 
     for k in range(steps):
         game_array = step_game(game_array, breed_time, energy_gain, breed_energy, start_energy)
@@ -25,10 +30,12 @@ def run_simulation(game_array, steps, breed_time, energy_gain, breed_energy, sta
 
         # Print the current progress if the percentage has changed
         if print_progress:
-            new_percent = np.floor((k + 1) / steps * 100).astype(int)
+            new_percent = (k + 1) * 100 // steps
             if new_percent > percent:
                 percent = new_percent
                 print(f"{percent:3}%", end="\r")
+        if progress is not None:
+            report_progress(progress, k + 1, steps)
 
         # If the array is full of fish or both species have gone extinct, stop simulating early
         if check_if_fish_fill_board(game_array) or check_if_everything_extinct(game_array):
@@ -36,20 +43,28 @@ def run_simulation(game_array, steps, breed_time, energy_gain, breed_energy, sta
 
     return game_array_list
 
-def run_simulation_minimal(game_array, steps, breed_time, energy_gain, breed_energy, start_energy):
+def run_simulation_minimal(game_array, steps, breed_time, energy_gain, breed_energy, start_energy, observer=None):
     """
     Run the simulation for the given number of steps, performing all the movements, hunts, breedings, and deaths.
     If the fish population fills the board or all the sharks and fish die, terminate early.
     Pass in the relevant simulation parameters.
+    If an observer function is given, call it with the step number and game array at each step (including step 0).
     Return two lists containing the fish and shark populations at each step.
     """
     fish_counts = [count_fish(game_array)]
     shark_counts = [count_sharks(game_array)]
+    progress = start_progress_reporting()
+    if observer is not None:
+        observer(0, game_array)
 
-    for _ in range(steps):
+    for k in range(steps):
         game_array = step_game(game_array, breed_time, energy_gain, breed_energy, start_energy)
         fish_counts.append(count_fish(game_array))
         shark_counts.append(count_sharks(game_array))
+        if progress is not None:
+            report_progress(progress, k + 1, steps)
+        if observer is not None:
+            observer(k + 1, game_array)
 
         # If the array is full of fish or both species have gone extinct, stop simulating early
         if check_if_fish_fill_board(game_array) or check_if_everything_extinct(game_array):
@@ -57,6 +72,23 @@ def run_simulation_minimal(game_array, steps, breed_time, energy_gain, breed_ene
 
     return fish_counts, shark_counts
 
+def start_progress_reporting(interval=1):
+    """
+    Return the state needed to report a simulation's progress through telemetry, or None if nothing is subscribed.
+    Checking for None is the only cost inside the simulation loop when telemetry is off.
+    """
+    if not telemetry.subscribers:
+        return None
+    return {"start_time": time.monotonic(), "rate_limiter": telemetry.create_rate_limiter(interval)}
+
+def report_progress(progress, step, steps):
+    """
+    Send a rate-limited "simulation_progress" event with the step reached and the steps per second.
+    """
+    if telemetry.should_report(progress["rate_limiter"]):
+        elapsed = max(time.monotonic() - progress["start_time"], 1e-9)
+        telemetry.emit("simulation_progress", step=step, steps=steps, steps_per_second=step / elapsed)
+
 def step_game(old_array, breed_time, energy_gain, breed_energy, start_energy):
     """
     Increment the simulation by 1 step, performing all the movements, hunts, breedings, and deaths.
@@ -71,76 +103,84 @@ def step_game(old_array, breed_time, energy_gain, breed_energy, start_energy):
     # Visit each cell in the array in a random order
     locs = create_random_location_sequence(old_array)
     for loc in locs:
-        cell_value = old_array[loc]
+        update_location(old_array, new_array, loc, breed_time, energy_gain, breed_energy, start_energy)
+
+    return new_array
 
-        # Handle fish behavior
-        if cell_value > 0:
+def update_location(old_array, new_array, loc, breed_time, energy_gain, breed_energy, start_energy):
+    """
+    Perform the movement, hunt, breeding, or death of the creature at the given location.
+    The creature is removed from the old array and its result is placed in the new array.
+    Both arrays are modified in place.
+    """
+    cell_value = old_array[loc]
+
+    # Handle fish behavior
+    if cell_value > 0:
+        # Find the adjacent cells that are open in both arrays
+        old_locs = get_empty_adjacent_locations(old_array, *loc)
+        new_locs = get_empty_adjacent_locations(new_array, *loc)
+        available_locs = list_intersection(old_locs, new_locs)
+        # If there are open adjacent cells, randomly move the fish into one
+        if len(available_locs) > 0:
+            chosen_loc = choose_random_location(available_locs)
+            # Check the fish is eligible to breed
+            if cell_value > breed_time:
+                # Place the fish in the new location, reset, and place a new fish in the old location
+                new_array[chosen_loc] = 1
+                new_array[loc] = 1
+            else:
+                # Place the fish in the new location, incrementing its time by 1
+                new_array[chosen_loc] = cell_value + 1
+        # If there are no open cells, the fish stays in place
+        else:
+            new_array[loc] = cell_value
+
+    # Handle shark behavior
+    elif cell_value < 0:
+        # Find the adjacent cells that contain fish in either array
+        old_locs = get_fish_occupied_adjacent_locations(old_array, *loc)
+        new_locs = get_fish_occupied_adjacent_locations(new_array, *loc)
+        available_locs = list_union(old_locs, new_locs)
+        # If there are fish occupied adjacent cells, randomly move the shark into one
+        if len(available_locs) > 0:
+            chosen_loc = choose_random_location(available_locs)
+            # Check the shark is eligible to breed
+            if cell_value < -breed_energy:
+                # Place the shark in the new location, and place a new shark at the old location
+                # Share the energy from the eating the fish
+                new_array[chosen_loc] = cell_value + start_energy - round(energy_gain / 2) + 1
+                new_array[loc] = -start_energy - round(energy_gain / 2)
+            else:
+                # Place the shark in the new location
+                # Give it all the energy from eating the fish
+                new_array[chosen_loc] = cell_value - energy_gain + 1
+            # Clear the eaten fish from the old array, if it came from there
+            if old_array[chosen_loc] > 0:
+                old_array[chosen_loc] = 0
+        # Try to move the shark randomly into an empty adjacent cell
+        else:
             # Find the adjacent cells that are open in both arrays
             old_locs = get_empty_adjacent_locations(old_array, *loc)
             new_locs = get_empty_adjacent_locations(new_array, *loc)
             available_locs = list_intersection(old_locs, new_locs)
-            # If there are open adjacent cells, randomly move the fish into one
-            if len(available_locs) > 0:
-                chosen_loc = choose_random_location(available_locs)
-                # Check the fish is eligible to breed
-                if cell_value > breed_time:
-                    # Place the fish in the new location, reset, and place a new fish in the old location
-                    new_array[chosen_loc] = 1
-                    new_array[loc] = 1
-                else:
-                    # Place the fish in the new location, incrementing its time by 1
-                    new_array[chosen_loc] = cell_value + 1
-            # If there are no open cells, the fish stays in place
-            else:
-                new_array[loc] = cell_value
-
-        # Handle shark behavior
-        elif cell_value < 0:
-            # Find the adjacent cells that contain fish in either array
-            old_locs = get_fish_occupied_adjacent_locations(old_array, *loc)
-            new_locs = get_fish_occupied_adjacent_locations(new_array, *loc)
-            available_locs = list_union(old_locs, new_locs)
-            # If there are fish occupied adjacent cells, randomly move the shark into one
+            # If there are open adjacent cells, randomly move the shark into one
             if len(available_locs) > 0:
                 chosen_loc = choose_random_location(available_locs)
                 # Check the shark is eligible to breed
                 if cell_value < -breed_energy:
                     # Place the shark in the new location, and place a new shark at the old location
-                    # Share the energy from the eating the fish
-                    new_array[chosen_loc] = cell_value + start_energy - round(energy_gain / 2) + 1
-                    new_array[loc] = -start_energy - round(energy_gain / 2)
+                    new_array[chosen_loc] = cell_value + start_energy + 1
+                    new_array[loc] = -start_energy
                 else:
                     # Place the shark in the new location
-                    # Give it all the energy from eating the fish
-                    new_array[chosen_loc] = cell_value - energy_gain + 1
-                # Clear the eaten fish from the old array, if it came from there
-                if old_array[chosen_loc] > 0:
-                    old_array[chosen_loc] = 0
-            # Try to move the shark randomly into an empty adjacent cell
+                    new_array[chosen_loc] = cell_value + 1
+            # The shark can't move and stays in place
             else:
-                # Find the adjacent cells that are open in both arrays
-                old_locs = get_empty_adjacent_locations(old_array, *loc)
-                new_locs = get_empty_adjacent_locations(new_array, *loc)
-                available_locs = list_intersection(old_locs, new_locs)
-                # If there are open adjacent cells, randomly move the shark into one
-                if len(available_locs) > 0:
-                    chosen_loc = choose_random_location(available_locs)
-                    # Check the shark is eligible to breed
-                    if cell_value < -breed_energy:
-                        # Place the shark in the new location, and place a new shark at the old location
-                        new_array[chosen_loc] = cell_value + start_energy + 1
-                        new_array[loc] = -start_energy
-                    else:
-                        # Place the shark in the new location
-                        new_array[chosen_loc] = cell_value + 1
-                # The shark can't move and stays in place
-                else:
-                    new_array[loc] = cell_value + 1
+                new_array[loc] = cell_value + 1
 
-        # Remove the creature from the old array
-        old_array[loc] = 0
-
-    return new_array
+    # Remove the creature from the old array
+    old_array[loc] = 0
 
 # Functions for game array initialization
 
@@ -198,6 +238,15 @@ def initialize_game_array_circular(game_array, initial_fish, initial_sharks, bre
 
 # Functions for randomization
 
+def seed_rng(seed=None):
+    """
+    Replace the random number generator with a new one created from the given seed.
+    Anything accepted by np.random.default_rng() can be used as the seed.
+    This makes a simulation reproducible, even inside a worker process.
+    """
+    global rng
+    rng = np.random.default_rng(seed)
+
 def create_random_location_sequence(array):
     """
     Create a list of (i, j) indices for each location in the array.
@@ -349,25 +398,16 @@ def create_image_array(game_array):
     The cell is translated into a 16x16 square of the RGB value for its color.
     """
     square_width = 16
-    rows = game_array.shape[0] * square_width
-    cols = game_array.shape[1] * square_width
-    result = np.zeros((rows, cols, 3), dtype="uint8")
-    empty_color = np.array([255, 255, 255], dtype="uint8")
-    fish_color = np.array([255, 0, 0], dtype="uint8")
-    shark_color = np.array([0, 0, 255], dtype="uint8")
-
-    for i, row in enumerate(game_array):
-        row_range = slice(i*square_width, (i + 1)*square_width)
-        for j, cell_value in enumerate(row):
-            col_range = slice(j*square_width, (j + 1)*square_width)
-            if cell_value > 0:
-                color = fish_color  # Fish are positive
-            elif cell_value < 0:
-                color = shark_color # Sharks are negative
-            else:
-                color = empty_color # Empty spaces are 0
-            result[row_range, col_range, :] = color
-
+    # Rows of the palette line up with the sign of each cell: shark (-1), empty (0), fish (+1)
+    palette = np.array([
+        [0, 0, 255],    # Sharks are negative
+        [255, 255, 255],# Empty spaces are 0
+        [255, 0, 0],    # Fish are positive
+    ], dtype="uint8")
+
+    colors = palette[np.sign(game_array).astype(int) + 1]
+    # Stretch each cell into a square of pixels
+    result = np.repeat(np.repeat(colors, square_width, axis=0), square_width, axis=1)
     return result
 
 def create_simulation_animation(game_array_list, fname, fps=20):
@@ -378,6 +418,96 @@ def create_simulation_animation(game_array_list, fname, fps=20):
     img_data = [create_image_array(game_array) for game_array in game_array_list]
     io.mimwrite(fname, img_data, format=".gif", fps=fps)
 
+def render_simulation_frames(frame_queue, fname, fps=20, mp4_fname=None, png_fname_format=None):
+    """
+    Encode the frames arriving on the given queue until None is received.
+    Each frame is a game array (only the sign of each cell is used).
+    Always write a gif at the given file name.
+    Optionally also write an mp4 (requires the imageio-ffmpeg plugin) and/or a numbered png sequence.
+    The png file name format should contain a field for the frame number, such as "media/frame_{:04}.png".
+    """
+    writers = [io.get_writer(fname, format=".gif", fps=fps)]
+    if mp4_fname is not None:
+        writers.append(io.get_writer(mp4_fname, fps=fps))
+
+    frame_number = 0
+    try:
+        while True:
+            game_array = frame_queue.get()
+            if game_array is None:
+                break
+            img = create_image_array(game_array)
+            for writer in writers:
+                writer.append_data(img)
+            if png_fname_format is not None:
+                io.imwrite(png_fname_format.format(frame_number), img)
+            frame_number += 1
+    finally:
+        for writer in writers:
+            writer.close()
+
+def send_frame_to_renderer(frame_queue, renderer, frame):
+    """
+    Put the frame on the renderer's queue, waiting while the queue is full.
+    Raise an error if the renderer process dies while waiting.
+    """
+    while True:
+        try:
+            frame_queue.put(frame, timeout=1)
+            return
+        except queue.Full:
+            if not renderer.is_alive():
+                raise RuntimeError("The animation renderer stopped unexpectedly")
+
+def run_simulation_with_animation(game_array, steps, breed_time, energy_gain, breed_energy, start_energy, fname, fps=20, mp4_fname=None, png_fname_format=None, queue_size=32, print_progress=False):
+    """
+    Run the simulation like run_simulation(), while a separate process encodes the animation frames.
+    Each new game array is handed to the renderer through a bounded queue as soon as it is computed.
+    If the renderer falls behind by queue_size frames, the simulation waits for it, which keeps memory bounded.
+    The animation outputs are described in render_simulation_frames().
+    Return two lists containing the fish and shark populations at each step.
+    """
+    frame_queue = mp.Queue(maxsize=queue_size)
+    renderer = mp.Process(target=render_simulation_frames, args=(frame_queue, fname, fps, mp4_fname, png_fname_format))
+    renderer.start()
+
+    # Only the species of each cell is needed to draw a frame, so send a compact copy
+    send_frame_to_renderer(frame_queue, renderer, np.sign(game_array).astype("int8"))
+    fish_counts = [count_fish(game_array)]
+    shark_counts = [count_sharks(game_array)]
+    percent = 0
+    progress = start_progress_reporting()
+
+    try:
+        for k in range(steps):
+            game_array = step_game(game_array, breed_time, energy_gain, breed_energy, start_energy)
+            send_frame_to_renderer(frame_queue, renderer, np.sign(game_array).astype("int8"))
+            fish_counts.append(count_fish(game_array))
+            shark_counts.append(count_sharks(game_array))
+
+            # Print the current progress if the percentage has changed
+            if print_progress:
+                new_percent = (k + 1) * 100 // steps
+                if new_percent > percent:
+                    percent = new_percent
+                    print(f"{percent:3}%", end="\r")
+            if progress is not None:
+                report_progress(progress, k + 1, steps)
+
+            # If the array is full of fish or both species have gone extinct, stop simulating early
+            if check_if_fish_fill_board(game_array) or check_if_everything_extinct(game_array):
+                break
+    finally:
+        # Tell the renderer there are no more frames, then wait for it to finish encoding
+        if renderer.is_alive():
+            send_frame_to_renderer(frame_queue, renderer, None)
+        renderer.join()
+
+    if renderer.exitcode != 0:
+        raise RuntimeError("The animation renderer failed")
+
+    return fish_counts, shark_counts
+
 def create_simulation_plots(fish_counts, shark_counts, fname):
     """
     Create plots describing the simulation.